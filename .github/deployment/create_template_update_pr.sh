@@ -26,6 +26,14 @@ PR_BODY="This automated PR updates the \`ansible-template-layouts\` project dire
 
 For more details, please review the included changes."
 
+# Append the structural changes reported by the update, if any
+if [ -f .cache/change-report.json ]; then
+  PR_BODY="${PR_BODY}
+
+### Structural Changes:
+$(python ./scripts/tree_diff.py .cache/change-report.json)"
+fi
+
 # Execute the GitHub CLI command to create the pull request
 if gh pr create \
    --title "$PR_TITLE" \
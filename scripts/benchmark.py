@@ -0,0 +1,254 @@
+from extract import extract_structures
+from parse import analyze_structure, build_structure_string, parse_directory_structure
+from retrieve import fetch_directory_structures
+from synthetic import generate_docs_page, generate_layouts, generate_structure_text, serve_directory
+from update import sync_template_layout
+
+from pathlib import Path
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BASELINE_VERSION = 1
+DEFAULT_SIZES = (10, 1000, 100000)
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_SECONDS = 0.001
+SYNC_MAX_LINES = 100000  # Larger layouts would create millions of files per run
+
+
+def time_best(func, repeat: int = 3, setup=None) -> float:
+    """
+    Times a function several times and keeps the best run, which is the least disturbed by other
+    activity on the machine.
+
+    Args:
+        func (callable): The function to time, called without arguments.
+        repeat (int): The number of timed runs.
+        setup (callable, optional): A function called, untimed, before each run.
+
+    Returns:
+        float: The best run time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_structure_stages(lines: int, repeat: int = 3, seed: int = 0) -> dict:
+    """
+    Benchmarks analysis, parsing, rendering and template syncing of a synthetic layout.
+
+    Args:
+        lines (int): The number of entries of the layout.
+        repeat (int): The number of timed runs per stage.
+        seed (int): The random seed of the generator.
+
+    Returns:
+        dict: The best run time in seconds of each stage, keyed by '<stage>/<lines>'.
+    """
+    text = generate_structure_text(lines, seed=seed)
+    structure = parse_directory_structure(text)
+
+    results = {
+        f"analyze/{lines}": time_best(lambda: analyze_structure(text), repeat),
+        f"parse/{lines}": time_best(lambda: parse_directory_structure(text), repeat),
+        f"render/{lines}": time_best(lambda: build_structure_string(structure), repeat),
+    }
+
+    if lines <= SYNC_MAX_LINES:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target = Path(temp_dir) / 'layout'
+
+            def clear():
+                shutil.rmtree(target, ignore_errors=True)
+
+            # A first sync creates every entry; a second one finds nothing to do
+            results[f"sync/{lines}"] = time_best(lambda: sync_template_layout(target, structure), repeat, clear)
+            results[f"resync/{lines}"] = time_best(lambda: sync_template_layout(target, structure), repeat)
+
+    return results
+
+
+def benchmark_extraction(sections: int, lines: int = 200, repeat: int = 3, seed: int = 0) -> dict:
+    """
+    Benchmarks extracting layouts from a synthetic documentation page, both from memory and fetched
+    from a local HTTP server, so that nothing touches the network.
+
+    Args:
+        sections (int): The number of layout sections on the page.
+        lines (int): The number of entries per layout.
+        repeat (int): The number of timed runs per stage.
+        seed (int): The random seed of the generator.
+
+    Returns:
+        dict: The best run time in seconds of each stage, keyed by '<stage>/<sections>'.
+
+    Raises:
+        ValueError: If the extracted layouts differ from the generated ones.
+    """
+    layouts = generate_layouts(sections, lines, seed)
+    page = generate_docs_page(layouts)
+    selectors = list(layouts)
+
+    extracted = extract_structures(page, selectors)
+    if extracted != {selector: text.strip() for selector, text in layouts.items()}:
+        raise ValueError("Extracted layouts differ from the generated ones.")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (Path(temp_dir) / 'sample_setup.html').write_text(page, encoding='utf-8')
+        with serve_directory(temp_dir) as base_url:
+            docs_url = f"{base_url}/sample_setup.html"
+            return {
+                f"extract/{sections}": time_best(lambda: extract_structures(page, selectors), repeat),
+                f"fetch/{sections}": time_best(lambda: fetch_directory_structures(docs_url, selectors), repeat),
+            }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, sections: int = 20, repeat: int = 3, seed: int = 0) -> dict:
+    """
+    Runs the whole benchmark suite.
+
+    Args:
+        sizes (iterable): The layout sizes, in lines, to benchmark the structure stages with.
+        sections (int): The number of layout sections on the synthetic documentation page.
+        repeat (int): The number of timed runs per stage.
+        seed (int): The random seed of the generators.
+
+    Returns:
+        dict: The best run time in seconds of every stage, keyed by '<stage>/<size>'.
+    """
+    results = {}
+    for lines in sizes:
+        results.update(benchmark_structure_stages(lines, repeat, seed))
+    results.update(benchmark_extraction(sections, repeat=repeat, seed=seed))
+    return results
+
+
+def save_baseline(results: dict, baseline_path):
+    """
+    Saves benchmark results as a JSON baseline.
+
+    Args:
+        results (dict): The benchmark results, as returned by `run_benchmarks`.
+        baseline_path (str or Path): The path of the baseline file.
+    """
+    baseline = {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    Path(baseline_path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+
+
+def load_baseline(baseline_path) -> dict:
+    """
+    Loads benchmark results from a JSON baseline.
+
+    Args:
+        baseline_path (str or Path): The path of the baseline file.
+
+    Returns:
+        dict: The benchmark results.
+
+    Raises:
+        ValueError: If the file is not a baseline written by this version of the suite.
+    """
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    if not isinstance(baseline, dict) or baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(f"'{baseline_path}' is not a version {BASELINE_VERSION} benchmark baseline.")
+    return baseline['results']
+
+
+def compare_results(baseline: dict, results: dict, threshold: float = DEFAULT_THRESHOLD,
+                    min_seconds: float = DEFAULT_MIN_SECONDS) -> list:
+    """
+    Compares benchmark results against a baseline. Stages missing from either side are ignored, as
+    are stages faster than `min_seconds` in both, whose timings are dominated by noise.
+
+    Args:
+        baseline (dict): The baseline results.
+        results (dict): The current results.
+        threshold (float): The tolerated slowdown, as a fraction of the baseline time.
+        min_seconds (float): The time below which a stage is not compared.
+
+    Returns:
+        list: A (stage, baseline seconds, current seconds) tuple for every stage that regressed.
+    """
+    regressions = []
+    for stage, seconds in results.items():
+        baseline_seconds = baseline.get(stage)
+        if baseline_seconds is None or max(seconds, baseline_seconds) < min_seconds:
+            continue
+        if seconds > baseline_seconds * (1 + threshold):
+            regressions.append((stage, baseline_seconds, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks parsing, rendering, extraction and syncing on synthetic layouts and pages.')
+    parser.add_argument('--sizes',
+                        default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated layout sizes in lines, up to 1000000 (default: %(default)s).')
+    parser.add_argument('--sections',
+                        type=int,
+                        default=20,
+                        help='Number of layout sections on the synthetic documentation page (default: %(default)s).')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help='Number of timed runs per stage; the best run is kept (default: %(default)s).')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Random seed of the generators (default: %(default)s).')
+    parser.add_argument('--save',
+                        type=Path,
+                        help='Save the results as a JSON baseline.')
+    parser.add_argument('--compare',
+                        type=Path,
+                        help='Compare the results against a JSON baseline and fail if a stage regressed.')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=DEFAULT_THRESHOLD,
+                        help='Tolerated slowdown before a stage counts as regressed (default: %(default)s).')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = run_benchmarks(sizes, args.sections, args.repeat, args.seed)
+
+    baseline = load_baseline(args.compare) if args.compare else {}
+    for stage, seconds in results.items():
+        line = f"{stage:<16} {seconds * 1000:10.2f} ms"
+        if stage in baseline:
+            line += f"  {seconds / baseline[stage]:5.2f}x baseline" if baseline[stage] else ''
+        logging.info(line)
+
+    if args.save:
+        save_baseline(results, args.save)
+        logging.info(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        regressions = compare_results(baseline, results, args.threshold)
+        for stage, baseline_seconds, seconds in regressions:
+            logging.error(f"Regression in {stage}: {baseline_seconds * 1000:.2f} ms -> {seconds * 1000:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        logging.info(f"No stage regressed by more than {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
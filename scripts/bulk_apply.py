@@ -0,0 +1,342 @@
+from manifest import content_hash
+from metrics import increment, timed
+from parse import normalize_layout_name
+from reconcile import apply_plan, format_plan, plan_template_layout
+
+from contextlib import nullcontext
+from pathlib import Path
+import argparse
+import errno
+import logging
+import os
+import shutil
+import sys
+
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+DEFAULT_LINK_MODE = 'auto'
+DEFAULT_KEEP = ('.git',)
+TEMPLATE_CACHE_NAME = 'layouts'
+
+# Linux ioctl cloning a whole file by sharing its extents (btrfs, XFS, bcachefs, OCFS2)
+FICLONE = 0x40049409
+
+# Errors meaning that a way of cloning is not supported between two paths, rather than a failure
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM}
+
+_FALLBACKS = {
+    'auto': ('reflink', 'copy'),
+    'reflink': ('reflink',),
+    'hardlink': ('hardlink',),
+    'copy': ('copy',),
+}
+
+
+def _reflink(source, destination):
+    """Clones a file with the FICLONE ioctl, so that both files share their data until either is written."""
+    try:
+        import fcntl
+    except ImportError:  # Not a POSIX platform
+        raise OSError(errno.ENOSYS, "Reflinks are not supported on this platform")
+
+    source_fd = os.open(source, os.O_RDONLY)
+    try:
+        destination_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            fcntl.ioctl(destination_fd, FICLONE, source_fd)
+        except OSError:
+            os.close(destination_fd)
+            os.unlink(destination)
+            raise
+        os.close(destination_fd)
+    finally:
+        os.close(source_fd)
+
+
+def _copy(source, destination):
+    """Copies a file's content, but not its permissions, like a file created by `reconcile.apply_plan`."""
+    shutil.copyfile(source, destination)
+
+
+_CLONERS = {'reflink': _reflink, 'hardlink': os.link, 'copy': _copy}
+
+
+def materialize_template(structure, cache_dir, write_comments=True) -> Path:
+    """
+    Materializes a layout once in the template cache, in a directory named after the hash of its
+    structure, so that every target can be populated from it. A template already in the cache is
+    reconciled like any template directory, which touches no files if it is intact.
+
+    Args:
+        structure (list): The parsed directory structure of the layout.
+        cache_dir (str or Path): The cache directory.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+
+    Returns:
+        Path: The materialized template.
+    """
+    name = content_hash(structure)[:16] + ('' if write_comments else '-bare')
+    template_path = Path(cache_dir) / TEMPLATE_CACHE_NAME / name
+    template_path.parent.mkdir(parents=True, exist_ok=True)
+    with timed('apply.materialize'):
+        apply_plan(plan_template_layout(template_path, structure, write_comments))
+    return template_path
+
+
+def apply_to_target(target, structure, template_path, link_mode=DEFAULT_LINK_MODE, keep=DEFAULT_KEEP,
+                    write_comments=True, dry_run=False) -> dict:
+    """
+    Reconciles a target directory with a layout, like `update.sync_template_layout`, but creates
+    files by cloning them from the materialized template instead of writing them. Cloning methods
+    that the target's filesystem does not support are dropped for the rest of the target.
+
+    Args:
+        target (str or Path): The target directory, such as the root of a project repository.
+        structure (list): The parsed directory structure of the layout.
+        template_path (str or Path or None): The materialized template. Unused in a dry run.
+        link_mode (str): How files are cloned: 'reflink', 'hardlink', 'copy', or 'auto' to use
+                         reflinks where the filesystem supports them and copies otherwise.
+        keep (tuple): Patterns of relative paths that are never deleted, such as '.git'.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+        dry_run (bool, optional): Whether to only plan the operations without applying them. Defaults to False.
+
+    Returns:
+        dict: The planned operations ('plan') and the number of applied operations per action and per
+              cloning method ('counts').
+    """
+    target = Path(target)
+    plan = plan_template_layout(target, structure, write_comments, keep)
+    counts = dict.fromkeys(('mkdir', 'create', 'rewrite', 'delete', 'move', *_CLONERS), 0)
+    if dry_run:
+        return {'plan': plan, 'counts': counts}
+
+    methods = list(_FALLBACKS[link_mode])
+    pending = []  # Operations applied as they are, between two cloned files
+    for operation in plan + [None]:
+        if operation is not None and operation.action not in ('create', 'rewrite'):
+            pending.append(operation)
+            continue
+
+        if pending:
+            for action, count in apply_plan(pending).items():
+                counts[action] += count
+            pending = []
+        if operation is None:
+            break
+
+        source = Path(template_path, operation.path.relative_to(target))
+        if operation.action == 'rewrite':
+            os.unlink(operation.path)  # Never write through a link shared with the template
+        while True:
+            method = methods[0]
+            try:
+                _CLONERS[method](source, operation.path)
+                break
+            except OSError as error:
+                if error.errno not in _UNSUPPORTED_ERRNOS or len(methods) == 1:
+                    raise
+                methods.pop(0)
+        counts[operation.action] += 1
+        counts[method] += 1
+
+    return {'plan': plan, 'counts': counts}
+
+
+def apply_layout(structure, targets, cache_dir, link_mode=DEFAULT_LINK_MODE, keep=DEFAULT_KEEP,
+                 write_comments=True, jobs=None, dry_run=False) -> dict:
+    """
+    Applies a layout to many target directories. The template is materialized once in the cache,
+    then the targets are reconciled with it concurrently, since the work is dominated by filesystem
+    calls that release the GIL. A target that fails does not stop the others.
+
+    Args:
+        structure (list): The parsed directory structure of the layout.
+        targets (list): The target directories.
+        cache_dir (str or Path): The cache directory holding the materialized templates.
+        link_mode (str): How files are cloned, see `apply_to_target`.
+        keep (tuple): Patterns of relative paths that are never deleted, such as '.git'.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+        jobs (int, optional): The number of targets applied concurrently. Defaults to the executor's default.
+        dry_run (bool, optional): Whether to only plan the operations without applying them. Defaults to False.
+
+    Returns:
+        dict: The outcome of each target, in the order given: the dictionary returned by
+              `apply_to_target`, or one with an 'error' key holding the exception.
+    """
+    if link_mode not in _FALLBACKS:
+        raise ValueError(f"Unknown link mode '{link_mode}', expected one of: {', '.join(LINK_MODES)}.")
+
+    template_path = None if dry_run else materialize_template(structure, cache_dir, write_comments)
+
+    def apply_one(target):
+        try:
+            return apply_to_target(target, structure, template_path, link_mode, keep, write_comments, dry_run)
+        except OSError as error:
+            return {'error': error}
+
+    with timed('apply.targets'):
+        if len(targets) > 1 and jobs != 1:
+            from concurrent.futures import ThreadPoolExecutor  # Only needed for several targets
+
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                outcomes = dict(zip(targets, executor.map(apply_one, targets)))
+        else:
+            outcomes = {target: apply_one(target) for target in targets}
+
+    for outcome in outcomes.values():
+        if 'error' in outcome:
+            continue
+        increment('targets_applied')
+        for action, counter in (('reflink', 'files_reflinked'), ('hardlink', 'files_hardlinked'),
+                                ('copy', 'files_copied'), ('delete', 'entries_deleted')):
+            increment(counter, outcome['counts'][action])
+
+    return outcomes
+
+
+def load_layout_structure(layout_name, structure_file=None):
+    """
+    Loads the structure of a layout from a local file, or else from the structure text last synced
+    by `update.py`, as recorded in the layout manifest, or else from the configured documentation.
+
+    Args:
+        layout_name (str): The layout name, matched after normalization.
+        structure_file (Path, optional): A local directory structure text file.
+
+    Returns:
+        list: The parsed directory structure.
+
+    Raises:
+        ValueError: If the layout is unknown.
+    """
+    from cli import fetch_structures, read_structure_file
+    from config import MANIFEST_PATH
+    from manifest import load_manifest
+    from parse_cache import parse_structure_cached
+
+    if structure_file is not None:
+        return read_structure_file(structure_file)
+
+    wanted = normalize_layout_name(layout_name)
+    for name, entry in load_manifest(MANIFEST_PATH)['templates'].items():
+        if normalize_layout_name(name) == wanted and entry.get('structure_text') is not None:
+            return parse_structure_cached(entry['structure_text'])
+
+    for name, structure_text in fetch_structures().items():
+        if normalize_layout_name(name) == wanted:
+            return parse_structure_cached(structure_text)
+
+    raise ValueError(f"Unknown layout '{layout_name}'.")
+
+
+def read_targets(args) -> list:
+    """Collects the target directories of the command line and of the targets file, without duplicates."""
+    targets = list(args.targets)
+    if args.targets_file:
+        if str(args.targets_file) == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = args.targets_file.read_text(encoding='utf-8').splitlines()
+        targets.extend(Path(line.strip()) for line in lines if line.strip() and not line.lstrip().startswith('#'))
+    return list(dict.fromkeys(targets))
+
+
+def add_apply_arguments(parser):
+    """
+    Adds the command-line arguments of the apply command to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument('layout',
+                        help="The layout name, such as 'sample-directory-layout'.")
+    parser.add_argument('targets',
+                        type=Path,
+                        nargs='*',
+                        help='The target directories.')
+    parser.add_argument('--targets-file',
+                        type=Path,
+                        help="A file listing one target directory per line ('-' for stdin).")
+    parser.add_argument('--structure-file',
+                        type=Path,
+                        help='Read the layout from this structure text file instead of the last synced revision.')
+    parser.add_argument('--link-mode',
+                        choices=LINK_MODES,
+                        default=DEFAULT_LINK_MODE,
+                        help='How files are cloned from the cached template (default: %(default)s, reflinks where '
+                             'supported and copies otherwise). Hardlinked files share their content with the '
+                             'template and every other target, so they must not be edited in place.')
+    parser.add_argument('--keep',
+                        action='append',
+                        help="Pattern of relative paths never deleted from targets; may be repeated "
+                             f"(default: {', '.join(DEFAULT_KEEP)}).")
+    parser.add_argument('--no-comments',
+                        action='store_true',
+                        help='Leave file contents alone instead of writing each file its comment.')
+    parser.add_argument('--jobs',
+                        type=int,
+                        help='Number of targets applied concurrently (default: chosen by the executor).')
+    parser.add_argument('--cache-dir',
+                        type=Path,
+                        help='Directory of the materialized templates (default: the configured CACHE_DIR).')
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help='Show the planned changes without applying them.')
+
+
+def execute_apply(args) -> bool:
+    """
+    Applies a layout to the targets selected by the command-line arguments and logs the outcomes.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_apply_arguments`.
+
+    Returns:
+        bool: True if every target was applied.
+    """
+    import tempfile
+    from config import CONFIG_PATH, get_cache_dir, load_config
+
+    targets = read_targets(args)
+    if not targets:
+        logging.info("No targets given.")
+        return True
+
+    structure = load_layout_structure(args.layout, args.structure_file)
+    keep = tuple(args.keep) if args.keep is not None else DEFAULT_KEEP
+    cache_dir = args.cache_dir or get_cache_dir(load_config(CONFIG_PATH))
+
+    with tempfile.TemporaryDirectory() if cache_dir is None else nullcontext(cache_dir) as cache_dir:
+        outcomes = apply_layout(structure, targets, cache_dir, args.link_mode, keep, not args.no_comments,
+                                args.jobs, args.dry_run)
+
+    failed = 0
+    for target, outcome in outcomes.items():
+        if 'error' in outcome:
+            failed += 1
+            logging.error(f"Failed to apply {args.layout} to {target}: {outcome['error']}")
+        elif args.dry_run:
+            logging.info(f"Planned changes for '{target}':\n{format_plan(outcome['plan'], target)}")
+        else:
+            counts = outcome['counts']
+            cloned = ', '.join(f"{counts[method]} {method}" for method in _CLONERS if counts[method])
+            logging.info(f"Applied {args.layout} to {target} ({len(outcome['plan'])} changes"
+                         f"{f'; {cloned}' if cloned else ''})")
+
+    logging.info(f"{'Planned' if args.dry_run else 'Applied'} {args.layout} for {len(outcomes) - failed} of "
+                 f"{len(outcomes)} targets.")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Applies a template layout to many target directories, cloning files from a cached template.')
+    add_apply_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    sys.exit(0 if execute_apply(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+from manifest import content_hash
+from metrics import increment, timed
+from reconcile import build_expected_index
+
+from fnmatch import fnmatchcase
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+CHECK_CACHE_VERSION = 1
+DEFAULT_PATTERNS = ('roles/common',)
+DEFAULT_IGNORE = ('.git',)
+OPTIONAL_MARKER = '(optional)'
+
+# Directories modified this recently are not cached: a change within the same mtime tick as the scan
+# would otherwise go unnoticed by the next one
+_RACY_NS = 2_000_000_000
+
+
+class LayoutPattern:
+    """
+    A directory of a compiled layout: the names of the directories and files it expects, the names
+    marked as optional, and the pattern every other subdirectory must follow, if any.
+    """
+
+    __slots__ = ('dirs', 'files', 'optional', 'wildcard')
+
+    def __init__(self):
+        self.dirs = {}
+        self.files = set()
+        self.optional = set()
+        self.wildcard = None
+
+
+def compile_layout(structure, patterns=DEFAULT_PATTERNS, strict_patterns=False) -> LayoutPattern:
+    """
+    Compiles a parsed layout into a tree of directory patterns. Each pattern path, such as
+    'roles/common', turns that directory into the pattern of every subdirectory of its parent: the
+    other directories the layout lists there (such as 'roles/webtier') are dropped as examples, and
+    any subdirectory must then contain what the pattern expects. Entries whose comment says
+    '(optional)' are not required.
+
+    Args:
+        structure (list): The parsed directory structure of the layout.
+        patterns (tuple): The layout paths of the directories to generalize.
+        strict_patterns (bool): Whether a pattern that is not a directory of the layout is an error,
+                                rather than ignored.
+
+    Returns:
+        LayoutPattern: The pattern of the root directory.
+
+    Raises:
+        ValueError: If `strict_patterns` is set and a pattern is not a directory of the layout.
+    """
+    root = LayoutPattern()
+    nodes = {'': root}
+    for relative_path, item in build_expected_index(structure).items():
+        parent_path, _, name = relative_path.rpartition('/')
+        parent = nodes[parent_path]
+        if item is None or item['type'] == 'directory':
+            nodes[relative_path] = parent.dirs.setdefault(name, LayoutPattern())
+        else:
+            parent.files.add(name)
+        if item is not None and OPTIONAL_MARKER in item['comment']:
+            parent.optional.add(name)
+
+    for pattern in patterns:
+        pattern = pattern.strip('/')
+        if pattern not in nodes or not pattern:
+            if strict_patterns:
+                raise ValueError(f"The pattern '{pattern}' is not a directory of the layout.")
+            continue
+        parent = nodes[pattern.rpartition('/')[0]]
+        parent.wildcard = nodes[pattern]
+        parent.dirs.clear()
+
+    return root
+
+
+def _list_directory(path):
+    """Lists the subdirectory and other entry names of a directory, without following symlinks."""
+    files, dirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            (dirs if entry.is_dir(follow_symlinks=False) else files).append(entry.name)
+    return files, dirs
+
+
+def _join(parent, name):
+    """Joins a relative path and a name with '/', the root being ''."""
+    return f"{parent}/{name}" if parent else name
+
+
+def _check_tree(root, start_path, start_node, cache, ignore, optional, started_ns, defer_wildcards):
+    """
+    Checks the directory at `start_path` (relative to `root`) and everything below it against a
+    pattern. Directory listings are taken from the cache when the directory's mtime is unchanged.
+    With `defer_wildcards`, subdirectories matched by a wildcard pattern are returned rather than
+    walked, so that they can be checked concurrently.
+
+    Returns:
+        tuple: The missing paths, the unexpected paths, the new cache records, the number of directories
+               listed and reused, and the deferred (relative path, pattern) tuples.
+    """
+    missing, unexpected, deferred = [], [], []
+    listings = {}
+    listed = reused = 0
+
+    def is_ignored(relative_path):
+        return any(fnmatchcase(relative_path, pattern) for pattern in ignore)
+
+    def is_required(node, name, relative_path):
+        return name not in node.optional and not any(fnmatchcase(relative_path, pattern) for pattern in optional)
+
+    pending = [(start_path, start_node)]
+    while pending:
+        dir_path, node = pending.pop()
+        path = os.path.join(root, dir_path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = cache.get(dir_path)
+        if cached is not None and cached[0] == mtime_ns:
+            files, dirs = cached[1], cached[2]
+            reused += 1
+        else:
+            files, dirs = _list_directory(path)
+            listed += 1
+        if mtime_ns < started_ns - _RACY_NS:
+            listings[dir_path] = [mtime_ns, files, dirs]
+
+        found_files, found_dirs = set(files), set(dirs)
+        for name in files:
+            relative_path = _join(dir_path, name)
+            if name not in node.files and not is_ignored(relative_path):
+                unexpected.append(relative_path)
+        for name in dirs:
+            relative_path = _join(dir_path, name)
+            if is_ignored(relative_path):
+                continue
+            if name in node.dirs:
+                pending.append((relative_path, node.dirs[name]))
+            elif node.wildcard is not None:
+                (deferred if defer_wildcards else pending).append((relative_path, node.wildcard))
+            else:
+                unexpected.append(f"{relative_path}/")  # Not descended into
+
+        for name in node.files - found_files:
+            relative_path = _join(dir_path, name)
+            if is_required(node, name, relative_path) and not is_ignored(relative_path):
+                missing.append(relative_path)
+        for name in node.dirs.keys() - found_dirs:
+            relative_path = _join(dir_path, name)
+            if is_required(node, name, relative_path) and not is_ignored(relative_path):
+                missing.append(f"{relative_path}/")
+
+    return missing, unexpected, listings, listed, reused, deferred
+
+
+def load_check_cache(cache_path, root) -> dict:
+    """
+    Loads the directory listings cached by the previous check of a directory.
+
+    Args:
+        cache_path (str or Path or None): The path of the cache file. None disables the cache.
+        root (str or Path): The checked directory the cache must belong to.
+
+    Returns:
+        dict: The cached listings, keyed by relative directory path, each a [mtime_ns, files, dirs]
+              list. Empty if the cache is missing, unreadable, outdated or belongs to another directory.
+    """
+    if cache_path is None:
+        return {}
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if (not isinstance(cache, dict) or cache.get('version') != CHECK_CACHE_VERSION
+            or cache.get('root') != str(Path(root).resolve()) or not isinstance(cache.get('directories'), dict)):
+        return {}
+    return cache['directories']
+
+
+def save_check_cache(cache_path, root, directories: dict):
+    """
+    Saves the directory listings of a check atomically, unless they are unchanged.
+
+    Args:
+        cache_path (str or Path): The path of the cache file.
+        root (str or Path): The checked directory.
+        directories (dict): The listings, as returned by `load_check_cache`.
+    """
+    from fileio import write_text_if_changed
+
+    cache = {'version': CHECK_CACHE_VERSION, 'root': str(Path(root).resolve()), 'directories': directories}
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    write_text_if_changed(cache_path, json.dumps(cache, sort_keys=True, ensure_ascii=False, separators=(',', ':')))
+
+
+def check_layout(root, layout: LayoutPattern, ignore=DEFAULT_IGNORE, optional=(), cache_path=None, jobs=None) -> dict:
+    """
+    Checks that a directory, such as an Ansible repository, conforms to a compiled layout. The top
+    of the tree is walked first; the subdirectories matched by a pattern, such as every role, are
+    then checked concurrently by a thread pool, as the work is dominated by `os.scandir` calls.
+
+    With a cache, the listing of every directory is recorded with its mtime, which changes whenever
+    an entry is added, removed or renamed in it. The next check only lists the directories whose
+    mtime changed, and takes the listing of the others from the cache.
+
+    Args:
+        root (str or Path): The directory to check.
+        layout (LayoutPattern): The compiled layout, as returned by `compile_layout`.
+        ignore (tuple): Patterns of relative paths that are neither required nor reported as unexpected.
+        optional (tuple): Patterns of relative paths, such as 'roles/*/files', that are not required.
+        cache_path (str or Path, optional): The path of the cache file. Every directory is listed if None.
+        jobs (int, optional): The number of threads. Defaults to the executor's default.
+
+    Returns:
+        dict: The sorted 'missing' and 'unexpected' relative paths (directories with a trailing '/'),
+              and the number of directories 'listed' and 'reused' from the cache.
+    """
+    root = Path(root)
+    started_ns = time.time_ns()
+    cache = load_check_cache(cache_path, root)
+
+    def check(start_path, start_node, defer_wildcards=False):
+        return _check_tree(root, start_path, start_node, cache, ignore, optional, started_ns, defer_wildcards)
+
+    with timed('check.walk'):
+        *outcome, deferred = check('', layout, defer_wildcards=True)
+        outcomes = [outcome]
+        if len(deferred) > 1 and jobs != 1:
+            from concurrent.futures import ThreadPoolExecutor  # Only needed for several pattern matches
+
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                outcomes.extend(outcome[:-1] for outcome in executor.map(lambda task: check(*task), deferred))
+        else:
+            outcomes.extend(check(*task)[:-1] for task in deferred)
+
+    missing, unexpected, directories = [], [], {}
+    listed = reused = 0
+    for outcome_missing, outcome_unexpected, listings, outcome_listed, outcome_reused in outcomes:
+        missing.extend(outcome_missing)
+        unexpected.extend(outcome_unexpected)
+        directories.update(listings)
+        listed += outcome_listed
+        reused += outcome_reused
+    increment('check_directories_listed', listed)
+    increment('check_directories_reused', reused)
+
+    if cache_path is not None:
+        save_check_cache(cache_path, root, directories)
+
+    return {'missing': sorted(missing), 'unexpected': sorted(unexpected), 'listed': listed, 'reused': reused}
+
+
+def add_check_arguments(parser):
+    """
+    Adds the command-line arguments of the check command to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument('layout',
+                        help="The layout name, such as 'sample-directory-layout'.")
+    parser.add_argument('target',
+                        type=Path,
+                        help='The directory to check, such as the root of an Ansible repository.')
+    parser.add_argument('--structure-file',
+                        type=Path,
+                        help='Read the layout from this structure text file instead of the last synced revision.')
+    parser.add_argument('--pattern',
+                        action='append',
+                        help='Layout directory that every sibling directory must follow; may be repeated '
+                             f"(default: {', '.join(DEFAULT_PATTERNS)}, where the layout has it).")
+    parser.add_argument('--ignore',
+                        action='append',
+                        help='Pattern of relative paths that are never reported; may be repeated '
+                             f"(default: {', '.join(DEFAULT_IGNORE)}).")
+    parser.add_argument('--optional',
+                        action='append',
+                        default=[],
+                        help="Pattern of relative paths that are not required, such as 'roles/*/files'; may be repeated.")
+    parser.add_argument('--format',
+                        choices=('text', 'json'),
+                        default='text',
+                        help='Report format (default: %(default)s). The JSON report is written to stdout.')
+    parser.add_argument('--jobs',
+                        type=int,
+                        help='Number of threads (default: chosen by the executor).')
+    parser.add_argument('--cache',
+                        type=Path,
+                        help='Cache of directory listings (default: a file per target in the configured CACHE_DIR).')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='List every directory, without loading or saving the cache.')
+
+
+def execute_check(args) -> bool:
+    """
+    Checks the target selected by the command-line arguments and reports the differences.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_check_arguments`.
+
+    Returns:
+        bool: True if the target conforms to the layout.
+    """
+    from bulk_apply import load_layout_structure
+    from config import CONFIG_PATH, get_cache_dir, load_config
+
+    if not args.target.is_dir():
+        logging.error(f"{args.target} does not conform to {args.layout}: it is not a directory.")
+        return False
+
+    cache_path = None
+    if args.cache is not None:
+        cache_path = args.cache
+    elif not args.no_cache:
+        cache_dir = get_cache_dir(load_config(CONFIG_PATH))
+        if cache_dir:
+            cache_path = cache_dir / f"check-{content_hash(str(args.target.resolve()))[:16]}.json"
+
+    structure = load_layout_structure(args.layout, args.structure_file)
+    layout = compile_layout(structure, args.pattern or DEFAULT_PATTERNS, strict_patterns=args.pattern is not None)
+    ignore = tuple(args.ignore) if args.ignore is not None else DEFAULT_IGNORE
+    report = check_layout(args.target, layout, ignore, tuple(args.optional), None if args.no_cache else cache_path,
+                          args.jobs)
+
+    conforms = not report['missing'] and not report['unexpected']
+    if args.format == 'json':
+        sys.stdout.write(json.dumps({'target': str(args.target), 'layout': args.layout, **report}, indent=2) + '\n')
+        return conforms
+
+    for path in report['missing']:
+        logging.info(f"missing     {path}")
+    for path in report['unexpected']:
+        logging.info(f"unexpected  {path}")
+    logging.info(f"{args.target} {'conforms' if conforms else 'does not conform'} to {args.layout}: "
+                 f"{len(report['missing'])} missing, {len(report['unexpected'])} unexpected "
+                 f"({report['listed']} directories listed, {report['reused']} cached).")
+    return conforms
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Checks that a directory, such as an Ansible repository, conforms to a template layout.')
+    add_check_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    sys.exit(0 if execute_check(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+from pathlib import Path
+import argparse
+import logging
+import sys
+
+# Subcommands import what they need when they run: the network stack (requests) and the HTML parsers
+# (BeautifulSoup, lxml) are only loaded by the subcommands that fetch documentation, so offline
+# subcommands such as parsing or rendering a local file start quickly.
+
+
+def read_structure_file(structure_file: Path):
+    """
+    Parses a local directory structure text file, reusing the tree cached by an earlier command
+    that parsed the same text.
+
+    Args:
+        structure_file (Path): The file, as extracted from the documentation, or '-' for stdin.
+
+    Returns:
+        list: The parsed directory structure.
+    """
+    from parse_cache import parse_structure_cached
+
+    if str(structure_file) == '-':
+        return parse_structure_cached(sys.stdin.read())
+    with open(structure_file, 'r', encoding='utf-8') as file:
+        return parse_structure_cached(file.read())
+
+
+def fetch_structures(no_cache=False, stream=False, backend='auto') -> dict:
+    """
+    Fetches the directory structures of every configured documentation source.
+
+    Args:
+        no_cache (bool): Whether to bypass the HTTP cache.
+        stream (bool): Whether to stream responses and stop reading once every selector is resolved.
+        backend (str): The extraction backend to use.
+
+    Returns:
+        dict: A dictionary with layout names as keys and directory structure text as values.
+    """
+    from config import CONFIG_PATH, get_cache_dir, load_config, validate_and_get_sources
+    from retrieve import fetch_all_directory_structures, structures_by_layout
+
+    config = load_config(CONFIG_PATH)
+    sources = validate_and_get_sources(config)
+    cache_dir = None if no_cache else get_cache_dir(config)
+    return structures_by_layout(fetch_all_directory_structures(sources, cache_dir, stream=stream, backend=backend))
+
+
+def command_fetch(args):
+    """
+    Fetches the configured layouts, and logs them or saves one text file per layout. Each layout is
+    parsed into the parse cache, so that later commands given the saved files do not parse them again.
+    """
+    from parse import normalize_layout_name
+    from parse_cache import parse_structure_cached
+
+    structures = fetch_structures(args.no_cache, args.stream, args.backend)
+    for layout_name, structure_text in structures.items():
+        if structure_text:
+            parse_structure_cached(structure_text)
+        if args.output_dir:
+            structure_path = args.output_dir / f"{normalize_layout_name(layout_name)}.txt"
+            structure_path.parent.mkdir(parents=True, exist_ok=True)
+            structure_path.write_text(f"{structure_text}\n", encoding='utf-8')
+            logging.info(f"Saved {layout_name} to {structure_path}")
+        elif structure_text:
+            logging.info(f"\nStructure for {layout_name}:\n{structure_text}\n")
+        else:
+            logging.info(f"No structure found for {layout_name}.")
+
+
+def command_parse(args):
+    """Logs the README sections of local structure files, or of the configured layouts."""
+    from parse import build_layout_section
+    from parse_cache import parse_structure_cached
+
+    if args.structure_files:
+        sections = [build_layout_section(path.stem, read_structure_file(path)) for path in args.structure_files]
+    else:
+        sections = [build_layout_section(layout_name, parse_structure_cached(structure_text))
+                    for layout_name, structure_text in fetch_structures().items()]
+    logging.info("\n".join(sections))
+
+
+def command_render(args):
+    """Renders a local structure file in the requested format."""
+    from render import render_structure
+
+    structure = read_structure_file(args.structure_file)
+
+    def write(sink):
+        render_structure(structure, sink, args.format)
+        if args.format == 'emoji' and structure:
+            sink.write('\n')  # The emoji tree is built for embedding and has no trailing newline
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as sink:
+            write(sink)
+    else:
+        write(sys.stdout)
+
+
+def command_sync(args):
+    """Syncs a directory with a local structure file."""
+    from reconcile import format_plan
+    from update import sync_template_layout
+
+    plan = sync_template_layout(args.target, read_structure_file(args.structure_file),
+                                write_comments=not args.no_comments, dry_run=args.dry_run, staged=args.staged)
+    if args.dry_run:
+        logging.info(format_plan(plan, args.target))
+    else:
+        logging.info(f"Synced {args.target} ({len(plan)} changes)")
+
+
+def command_diff(args):
+    """Logs the structural changes between two local structure files."""
+    from tree_diff import change_to_dict, diff_structures, format_change_report
+
+    changes = diff_structures(read_structure_file(args.old_file), read_structure_file(args.new_file))
+    logging.info(format_change_report({args.new_file.stem: [change_to_dict(change) for change in changes]}))
+
+
+def command_scan(args):
+    """Scans a local documentation snapshot for layouts, as `scan.py` does."""
+    from scan import execute_scan
+
+    execute_scan(args)
+
+
+def command_apply(args):
+    """Applies a layout to many target directories, as `bulk_apply.py` does."""
+    from bulk_apply import execute_apply
+
+    if not execute_apply(args):
+        sys.exit(1)
+
+
+def command_check(args):
+    """Checks a directory against a layout, as `check.py` does."""
+    from check import execute_check
+
+    if not execute_check(args):
+        sys.exit(1)
+
+
+def command_export(args):
+    """Exports a layout as a reproducible archive, as `export.py` does."""
+    from export import execute_export
+
+    execute_export(args)
+
+
+def command_snapshots(args):
+    """Records, lists, shows or diffs layout snapshots, as `snapshots.py` does."""
+    from snapshots import execute_snapshots
+
+    execute_snapshots(args)
+
+
+def command_update(args):
+    """Runs the full update, as `update.py` does."""
+    from update import execute_update
+
+    execute_update(args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the command-line parser with one subcommand per stage of the pipeline.
+
+    Returns:
+        argparse.ArgumentParser: The parser. Each subcommand stores its handler as the 'handler' default.
+    """
+    from bulk_apply import add_apply_arguments
+    from check import add_check_arguments
+    from export import add_export_arguments
+    from extract import BACKENDS, DEFAULT_BACKEND
+    from render import FORMATS
+    from scan import add_scan_arguments
+    from snapshots import add_snapshot_arguments
+    from update import add_update_arguments
+
+    parser = argparse.ArgumentParser(description='Fetches, scans, parses, renders, diffs, syncs, applies, checks and exports Ansible template layouts.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help='Fetch the layouts of the configured documentation sources.')
+    fetch_parser.add_argument('--output-dir',
+                              type=Path,
+                              help='Save each layout as a text file in this directory instead of logging it.')
+    fetch_parser.add_argument('--no-cache',
+                              action='store_true',
+                              help='Bypass the HTTP cache.')
+    fetch_parser.add_argument('--stream',
+                              action='store_true',
+                              help='Stream the documentation and stop downloading once every selector is resolved.')
+    fetch_parser.add_argument('--backend',
+                              choices=['auto', *BACKENDS],
+                              default=DEFAULT_BACKEND,
+                              help='HTML extraction backend to use (default: %(default)s).')
+    fetch_parser.set_defaults(handler=command_fetch)
+
+    parse_parser = subparsers.add_parser('parse', help='Build the README sections of layouts.')
+    parse_parser.add_argument('structure_files',
+                              type=Path,
+                              nargs='*',
+                              help='Local directory structure text files. Without any, the configured layouts are fetched.')
+    parse_parser.set_defaults(handler=command_parse)
+
+    render_parser = subparsers.add_parser('render', help='Render a local directory structure text file.')
+    render_parser.add_argument('structure_file',
+                               type=Path,
+                               help="Directory structure text file, as extracted from the documentation ('-' for stdin).")
+    render_parser.add_argument('--format',
+                               choices=FORMATS,
+                               default='emoji',
+                               help='Output format (default: %(default)s).')
+    render_parser.add_argument('--output',
+                               type=Path,
+                               help='Write to this file instead of stdout.')
+    render_parser.set_defaults(handler=command_render)
+
+    sync_parser = subparsers.add_parser('sync', help='Sync a directory with a local directory structure text file.')
+    sync_parser.add_argument('structure_file',
+                             type=Path,
+                             help="Directory structure text file, as extracted from the documentation ('-' for stdin).")
+    sync_parser.add_argument('target',
+                             type=Path,
+                             help='The directory to sync.')
+    sync_parser.add_argument('--dry-run',
+                             action='store_true',
+                             help='Show the planned changes without applying them.')
+    sync_parser.add_argument('--no-comments',
+                             action='store_true',
+                             help='Leave file contents alone instead of writing each file its comment.')
+    sync_parser.add_argument('--staged',
+                             action='store_true',
+                             help='Build the new tree next to the target and swap it into place atomically.')
+    sync_parser.set_defaults(handler=command_sync)
+
+    diff_parser = subparsers.add_parser('diff', help='Show the structural changes between two local structure files.')
+    diff_parser.add_argument('old_file',
+                             type=Path,
+                             help='The old directory structure text file.')
+    diff_parser.add_argument('new_file',
+                             type=Path,
+                             help='The new directory structure text file.')
+    diff_parser.set_defaults(handler=command_diff)
+
+    scan_parser = subparsers.add_parser('scan', help='Scan a local documentation snapshot for layouts.')
+    add_scan_arguments(scan_parser)
+    scan_parser.set_defaults(handler=command_scan)
+
+    apply_parser = subparsers.add_parser('apply', help='Apply a layout to many target directories.')
+    add_apply_arguments(apply_parser)
+    apply_parser.set_defaults(handler=command_apply)
+
+    check_parser = subparsers.add_parser('check', help='Check that a directory conforms to a layout.')
+    add_check_arguments(check_parser)
+    check_parser.set_defaults(handler=command_check)
+
+    export_parser = subparsers.add_parser('export', help='Export a layout as a tar.gz or zip archive.')
+    add_export_arguments(export_parser)
+    export_parser.set_defaults(handler=command_export)
+
+    snapshots_parser = subparsers.add_parser('snapshots', help='Record, list, show and diff layout snapshots.')
+    add_snapshot_arguments(snapshots_parser)
+    snapshots_parser.set_defaults(handler=command_snapshots)
+
+    update_parser = subparsers.add_parser('update', help='Update the README and template directories.')
+    add_update_arguments(update_parser)
+    update_parser.set_defaults(handler=command_update)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs a subcommand.
+
+    Args:
+        argv (list, optional): The command-line arguments, without the program name. Defaults to sys.argv[1:].
+    """
+    from parse_cache import configure_parse_cache_from_config
+
+    args = build_parser().parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not getattr(args, 'no_cache', False):
+        configure_parse_cache_from_config()
+
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
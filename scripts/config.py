@@ -5,6 +5,7 @@ import configparser
 SCRIPT_DIR = Path(__file__).parent
 CONFIG_PATH = SCRIPT_DIR / ".." / "config.ini"
 README_PATH = SCRIPT_DIR / ".." / "README.md"
+MANIFEST_PATH = SCRIPT_DIR / ".." / ".layout-manifest.json"
 
 
 def load_config(config_path: str = CONFIG_PATH) -> configparser.ConfigParser:
@@ -31,16 +32,22 @@ def load_config(config_path: str = CONFIG_PATH) -> configparser.ConfigParser:
     return config
 
 
-def validate_and_get_selectors(config):
+SOURCE_SECTION_PREFIX = 'source:'
+DEFAULT_SOURCE_NAME = 'default'
+
+
+def validate_and_get_selectors(config, section='DEFAULT'):
     """
     Extracts selectors from the configuration object, ensuring they are properly formatted and valid.
 
-    This function reads the 'SELECTORS' key from the 'DEFAULT' section of the provided configuration
-    object. It splits this key's value into a list of selectors, trims any surrounding whitespace from
-    each selector, and validates that at least one selector has been specified.
+    This function reads the 'SELECTORS' key from the given section (the 'DEFAULT' section unless
+    specified otherwise) of the provided configuration object. It splits this key's value into a list
+    of selectors, trims any surrounding whitespace from each selector, and validates that at least one
+    selector has been specified.
 
     Args:
         config (configparser.ConfigParser): The loaded configuration object.
+        section (str): The configuration section to read. Defaults to 'DEFAULT'.
 
     Returns:
         list: A list of trimmed selectors.
@@ -51,30 +58,31 @@ def validate_and_get_selectors(config):
     """
     # Attempt to retrieve and process the 'SELECTORS' configuration.
     try:
-        selectors_raw = config['DEFAULT'].get('SELECTORS', '')
+        selectors_raw = config[section].get('SELECTORS', '')
         selectors = [selector.strip() for selector in selectors_raw.split(',') if selector.strip()]
 
         if not selectors:
-            raise ValueError("No selectors found in configuration. Ensure at least one selector is specified.")
+            raise ValueError(f"No selectors found in '{section}' section. Ensure at least one selector is specified.")
 
     except KeyError as e:
         # Reraise with a more informative error message.
-        raise KeyError(f"Missing required configuration key in 'DEFAULT' section: {e}")
+        raise KeyError(f"Missing required configuration key in '{section}' section: {e}")
 
     return selectors
 
 
-def validate_and_get_docs_url(config):
+def validate_and_get_docs_url(config, section='DEFAULT'):
     """
     Validates and retrieves the document URL from the configuration object.
 
-    This function ensures that the 'DOCS_URL' key exists within the 'DEFAULT' section of the
-    configuration object and that its value is a well-formed URL with an acceptable scheme (http or https).
-    It aims to prevent errors by validating the URL's format and scheme before any attempt to use it
-    in network operations.
+    This function ensures that the 'DOCS_URL' key exists within the given section (the 'DEFAULT'
+    section unless specified otherwise) of the configuration object and that its value is a
+    well-formed URL with an acceptable scheme (http or https). It aims to prevent errors by
+    validating the URL's format and scheme before any attempt to use it in network operations.
 
     Args:
         config (configparser.ConfigParser): The loaded configuration object.
+        section (str): The configuration section to read. Defaults to 'DEFAULT'.
 
     Returns:
         str: The validated document URL.
@@ -84,9 +92,9 @@ def validate_and_get_docs_url(config):
         ValueError: If the 'DOCS_URL' value is not a valid URL or uses an unsupported scheme.
     """
     try:
-        docs_url = config['DEFAULT'].get('DOCS_URL', '').strip()
+        docs_url = config[section].get('DOCS_URL', '').strip()
         if not docs_url:
-            raise ValueError("The 'DOCS_URL' configuration is empty.")
+            raise ValueError(f"The 'DOCS_URL' configuration in '{section}' section is empty.")
 
         # Parse the URL and validate its scheme
         parsed_url = urlparse(docs_url)
@@ -94,11 +102,73 @@ def validate_and_get_docs_url(config):
             raise ValueError(f"The 'DOCS_URL' value '{docs_url}' is not a valid URL or uses an unsupported scheme.")
 
     except KeyError as e:
-        raise KeyError(f"Missing required 'DOCS_URL' key in 'DEFAULT' section: {e}")
+        raise KeyError(f"Missing required 'DOCS_URL' key in '{section}' section: {e}")
 
     return docs_url
 
 
+def validate_and_get_sources(config):
+    """
+    Validates and retrieves every documentation source from the configuration object.
+
+    Each section named 'source:<name>' defines one source with its own 'DOCS_URL' and 'SELECTORS'
+    keys; keys omitted from a source section fall back to the 'DEFAULT' section. If no source
+    sections are defined, the 'DEFAULT' section itself is the only source, named 'default'.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration object.
+
+    Returns:
+        dict: A dictionary mapping each source name to a dictionary with 'docs_url' and 'selectors' keys,
+              in configuration order.
+
+    Raises:
+        KeyError: If a required key is missing from a source.
+        ValueError: If a source has an invalid URL or no selectors.
+    """
+    source_sections = [section for section in config.sections() if section.startswith(SOURCE_SECTION_PREFIX)]
+    if not source_sections:
+        return {
+            DEFAULT_SOURCE_NAME: {
+                'docs_url': validate_and_get_docs_url(config),
+                'selectors': validate_and_get_selectors(config),
+            }
+        }
+
+    sources = {}
+    for section in source_sections:
+        source_name = section[len(SOURCE_SECTION_PREFIX):].strip()
+        if not source_name:
+            raise ValueError(f"The source section '{section}' has no name.")
+
+        sources[source_name] = {
+            'docs_url': validate_and_get_docs_url(config, section),
+            'selectors': validate_and_get_selectors(config, section),
+        }
+
+    return sources
+
+
+def get_cache_dir(config):
+    """
+    Retrieves the cache directory from the configuration object.
+
+    The 'CACHE_DIR' key of the 'DEFAULT' section is optional. Relative paths are resolved against
+    the directory containing the configuration file, and an empty value disables caching.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration object.
+
+    Returns:
+        Path or None: The cache directory, or None if caching is disabled.
+    """
+    cache_dir = config['DEFAULT'].get('CACHE_DIR', '').strip()
+    if not cache_dir:
+        return None
+
+    return Path(CONFIG_PATH).parent / cache_dir
+
+
 def find_project_root(start_path: Path, marker: str = 'config.ini') -> str:
     """
     Finds the project root by looking for a marker file or directory, with error handling.
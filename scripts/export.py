@@ -0,0 +1,216 @@
+from metrics import increment, timed
+from reconcile import build_expected_index, expected_file_content
+
+from pathlib import Path
+import argparse
+import gzip
+import hashlib
+import io
+import logging
+import sys
+import tarfile
+import zipfile
+
+ARCHIVE_FORMATS = ('tar.gz', 'zip')
+DEFAULT_ARCHIVE_FORMAT = 'tar.gz'
+
+# Every entry gets the same timestamp, so that archives only change when the layout does. Zip
+# timestamps cannot predate 1980, so that is the epoch used by both formats.
+ARCHIVE_MTIME = 315532800  # 1980-01-01T00:00:00Z
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+DIRECTORY_MODE = 0o755
+FILE_MODE = 0o644
+
+
+def iter_archive_entries(structure, write_comments=True, prefix=''):
+    """
+    Synthesizes the entries of a layout as they would be materialized by `update.sync_template_layout`,
+    without touching the filesystem. Entries are sorted by path segments, so every directory comes
+    before its contents and the order does not depend on how the structure text was written.
+    Contents are produced one entry at a time, so only the index of paths is held in memory.
+
+    Args:
+        structure (list): The parsed directory structure of the layout.
+        write_comments (bool, optional): Whether files carry their comment as a header. Defaults to True.
+        prefix (str, optional): A directory that every entry is placed under, such as the layout name.
+
+    Yields:
+        tuple: The '/'-separated archive path (str) and the file content (bytes), or None for directories.
+    """
+    index = build_expected_index(structure)
+    prefix = prefix.strip('/')
+    if prefix:
+        yield prefix, None
+        prefix = f"{prefix}/"
+
+    for relative_path in sorted(index, key=lambda path: path.split('/')):
+        item = index[relative_path]
+        if item is None or item['type'] == 'directory':
+            yield f"{prefix}{relative_path}", None
+        else:
+            content = expected_file_content(item, write_comments)
+            yield f"{prefix}{relative_path}", content if content is not None else b''
+
+
+def _write_tar_gz(entries, sink) -> int:
+    """Writes entries as a gzip-compressed tar stream, with fixed ownership, modes and timestamps."""
+    count = 0
+    # Compressed with GzipFile rather than tarfile's 'w|gz' mode, whose gzip header stamps the current time
+    with gzip.GzipFile(filename='', fileobj=sink, mode='wb', compresslevel=6, mtime=0) as compressed, \
+            tarfile.open(fileobj=compressed, mode='w|', format=tarfile.PAX_FORMAT) as archive:
+        for path, content in entries:
+            info = tarfile.TarInfo(path)
+            info.mtime = ARCHIVE_MTIME
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                info.mode = DIRECTORY_MODE
+                archive.addfile(info)
+            else:
+                info.mode = FILE_MODE
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+            count += 1
+    return count
+
+
+def _write_zip(entries, sink) -> int:
+    """Writes entries as a deflated zip stream, with fixed modes and timestamps."""
+    count = 0
+    # ZipFile writes data descriptors instead of seeking back when the sink is not seekable, like a pipe
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content in entries:
+            if content is None:
+                info = zipfile.ZipInfo(f"{path}/", ARCHIVE_DATE_TIME)
+                info.external_attr = (0o040000 | DIRECTORY_MODE) << 16 | 0x10  # S_IFDIR and the MS-DOS directory flag
+                archive.writestr(info, b'')
+            else:
+                info = zipfile.ZipInfo(path, ARCHIVE_DATE_TIME)
+                info.external_attr = (0o100000 | FILE_MODE) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, content)
+            count += 1
+    return count
+
+
+_WRITERS = {'tar.gz': _write_tar_gz, 'zip': _write_zip}
+
+
+class _HashingWriter:
+    """A write-only file object that hashes everything written to the underlying sink."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.sink.write(data)
+
+    def flush(self):
+        self.sink.flush()
+
+
+def export_layout(structure, sink, archive_format=DEFAULT_ARCHIVE_FORMAT, write_comments=True, prefix='') -> dict:
+    """
+    Streams a layout as a reproducible archive. The same structure always produces the same bytes,
+    so archives can be cached and compared by their hash.
+
+    Args:
+        structure (list): The parsed directory structure of the layout.
+        sink (file): A binary file object to write to, which does not need to be seekable.
+        archive_format (str): The archive format, 'tar.gz' or 'zip'.
+        write_comments (bool, optional): Whether files carry their comment as a header. Defaults to True.
+        prefix (str, optional): A directory that every entry is placed under, such as the layout name.
+
+    Returns:
+        dict: The number of archived entries ('entries'), and the size ('size') and SHA-256 hash
+              ('hash') of the archive.
+
+    Raises:
+        ValueError: If the archive format is unknown.
+    """
+    if archive_format not in _WRITERS:
+        raise ValueError(f"Unknown archive format '{archive_format}', expected one of: {', '.join(ARCHIVE_FORMATS)}.")
+
+    writer = _HashingWriter(sink)
+    with timed('export'):
+        count = _WRITERS[archive_format](iter_archive_entries(structure, write_comments, prefix), writer)
+    writer.flush()
+    increment('entries_exported', count)
+    return {'entries': count, 'size': writer.size, 'hash': writer.hash.hexdigest()}
+
+
+def guess_archive_format(output) -> str:
+    """Infers the archive format from an output file name, defaulting to a gzip-compressed tar."""
+    if output is not None and str(output).lower().endswith('.zip'):
+        return 'zip'
+    return DEFAULT_ARCHIVE_FORMAT
+
+
+def add_export_arguments(parser):
+    """
+    Adds the command-line arguments of the export command to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument('layout',
+                        help="The layout name, such as 'sample-directory-layout'.")
+    parser.add_argument('--structure-file',
+                        type=Path,
+                        help='Read the layout from this structure text file instead of the last synced revision.')
+    parser.add_argument('--output',
+                        type=Path,
+                        help="The archive to write ('-' or omitted for stdout).")
+    parser.add_argument('--format',
+                        choices=ARCHIVE_FORMATS,
+                        help='Archive format (default: inferred from the output name, else tar.gz).')
+    parser.add_argument('--prefix',
+                        help='Directory every entry is placed under (default: the normalized layout name; '
+                             "'' for none).")
+    parser.add_argument('--no-comments',
+                        action='store_true',
+                        help='Leave files empty instead of writing each file its comment.')
+
+
+def execute_export(args):
+    """
+    Exports the layout selected by the command-line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_export_arguments`.
+    """
+    from bulk_apply import load_layout_structure
+    from parse import normalize_layout_name
+
+    structure = load_layout_structure(args.layout, args.structure_file)
+    archive_format = args.format or guess_archive_format(args.output)
+    prefix = normalize_layout_name(args.layout) if args.prefix is None else args.prefix
+
+    if args.output is None or str(args.output) == '-':
+        outcome = export_layout(structure, sys.stdout.buffer, archive_format, not args.no_comments, prefix)
+        logging.info(f"Exported {args.layout}: {outcome['entries']} entries, sha256 {outcome['hash']}")
+        return
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'wb') as sink:
+        outcome = export_layout(structure, sink, archive_format, not args.no_comments, prefix)
+    logging.info(f"Exported {args.layout} to {args.output}: {outcome['entries']} entries, {outcome['size']} bytes, "
+                 f"sha256 {outcome['hash']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Exports a template layout as a reproducible tar.gz or zip archive, without materializing it.')
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    execute_export(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+from config import (
+    CONFIG_PATH,
+    load_config,
+    validate_and_get_sources,
+)
+from stream_extract import SectionTextCollector, selector_to_id
+
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import importlib.util
+import logging
+import time
+
+# BeautifulSoup, soupsieve and lxml are imported by the backends that use them, so that importing
+# this module (e.g. for the backend names) stays cheap.
+
+DEFAULT_BACKEND = 'auto'
+
+CompiledSelector = namedtuple('CompiledSelector', ['selector', 'element_id', 'pattern'])
+"""A selector compiled once per run: either a plain element ID or a compiled soupsieve pattern."""
+
+
+@lru_cache(maxsize=None)
+def compile_selectors(selectors: tuple) -> tuple:
+    """
+    Compiles selectors once so that they can be resolved against any number of documents. Selectors
+    starting with an alphanumeric character are treated as element IDs, as in `fetch_directory_structures`.
+    Plain ID selectors are matched by attribute lookup; anything else is compiled with soupsieve.
+
+    Args:
+        selectors (tuple): A tuple of CSS selectors or element IDs.
+
+    Returns:
+        tuple: A tuple of CompiledSelector, in the order of `selectors`.
+    """
+    compiled = []
+    for selector in selectors:
+        element_id = selector_to_id(selector)
+        pattern = None
+        if element_id is None:
+            import soupsieve
+            pattern = soupsieve.compile(f'#{selector}' if str(selector[0]).isalnum() else selector)
+        compiled.append(CompiledSelector(selector, element_id, pattern))
+    return tuple(compiled)
+
+
+def _resolve_soup_sections(soup, compiled: tuple) -> dict:
+    """
+    Resolves every compiled selector in a single walk over the document, stopping as soon as all of
+    them are matched. As with `select_one`, the first matching element in document order wins.
+    """
+    from bs4 import Tag
+
+    pending_ids = {}
+    for item in compiled:
+        if item.element_id is not None:
+            pending_ids.setdefault(item.element_id, []).append(item.selector)
+    pending_patterns = [item for item in compiled if item.pattern is not None]
+
+    sections = {}
+    for element in soup.descendants:
+        if not isinstance(element, Tag):
+            continue
+
+        element_id = element.get('id')
+        if element_id in pending_ids:
+            for selector in pending_ids.pop(element_id):
+                sections[selector] = element
+
+        if pending_patterns:
+            remaining = []
+            for item in pending_patterns:
+                if item.pattern.match(element):
+                    sections[item.selector] = element
+                else:
+                    remaining.append(item)
+            pending_patterns = remaining
+
+        if not pending_ids and not pending_patterns:
+            break
+
+    return {selector: _soup_section_text(section) for selector, section in sections.items()}
+
+
+def _soup_section_text(section) -> str:
+    """Joins the text of the <pre> elements inside a BeautifulSoup section."""
+    return '\n'.join(pre.get_text() for pre in section.find_all('pre')).strip()
+
+
+def extract_with_soup(content, compiled: tuple) -> dict:
+    """
+    Extracts sections with BeautifulSoup's pure-Python 'html.parser', building the full document tree.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        compiled (tuple): The compiled selectors, as returned by `compile_selectors`.
+
+    Returns:
+        dict: A dictionary mapping each found selector to its directory structure text.
+    """
+    from bs4 import BeautifulSoup
+
+    return _resolve_soup_sections(BeautifulSoup(content, 'html.parser'), compiled)
+
+
+def extract_with_strainer(content, compiled: tuple) -> dict:
+    """
+    Extracts sections with BeautifulSoup, restricting the parse with a SoupStrainer so that only the
+    target elements and their descendants are materialized. This requires every selector to be an
+    element ID; otherwise the full document is parsed.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        compiled (tuple): The compiled selectors, as returned by `compile_selectors`.
+
+    Returns:
+        dict: A dictionary mapping each found selector to its directory structure text.
+    """
+    ids = [item.element_id for item in compiled]
+    if None in ids:
+        return extract_with_soup(content, compiled)
+
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer(id=ids))
+    return _resolve_soup_sections(soup, compiled)
+
+
+@lru_cache(maxsize=None)
+def _compile_lxml_selector(selector: str):
+    """Compiles a CSS selector to an lxml XPath matcher once per run. Requires the cssselect package."""
+    from lxml.cssselect import CSSSelector
+    return CSSSelector(f'#{selector}' if str(selector[0]).isalnum() else selector)
+
+
+def extract_with_lxml(content, compiled: tuple) -> dict:
+    """
+    Extracts sections with lxml's C-accelerated HTML parser. Element IDs are resolved in a single
+    pass over the tree; other CSS selectors are compiled to XPath, which requires cssselect.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        compiled (tuple): The compiled selectors, as returned by `compile_selectors`.
+
+    Returns:
+        dict: A dictionary mapping each found selector to its directory structure text.
+
+    Raises:
+        ImportError: If lxml is not installed, or cssselect is needed but not installed.
+    """
+    try:
+        import lxml.html
+    except ImportError as e:  # lxml is an optional, faster backend
+        raise ImportError("The 'lxml' extraction backend requires the lxml package.") from e
+
+    root = lxml.html.fromstring(content)
+
+    pending_ids = {}
+    for item in compiled:
+        if item.element_id is not None:
+            pending_ids.setdefault(item.element_id, []).append(item.selector)
+
+    sections = {}
+    if pending_ids:
+        for element in root.iter():
+            element_id = element.get('id') if isinstance(element.tag, str) else None
+            if element_id in pending_ids:
+                for selector in pending_ids.pop(element_id):
+                    sections[selector] = element
+                if not pending_ids:
+                    break
+
+    for item in compiled:
+        if item.pattern is not None:
+            matches = _compile_lxml_selector(item.selector)(root)
+            if matches:
+                sections[item.selector] = matches[0]
+
+    return {
+        selector: '\n'.join(''.join(pre.itertext()) for pre in section.iter('pre')).strip()
+        for selector, section in sections.items()
+    }
+
+
+def extract_with_stream(content, compiled: tuple) -> dict:
+    """
+    Extracts sections with the incremental collector used for streamed responses, without building a
+    document tree. This requires every selector to be an element ID; otherwise the full document is
+    parsed with BeautifulSoup.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        compiled (tuple): The compiled selectors, as returned by `compile_selectors`.
+
+    Returns:
+        dict: A dictionary mapping each found selector to its directory structure text.
+    """
+    ids = [item.element_id for item in compiled]
+    if None in ids:
+        return extract_with_soup(content, compiled)
+
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+
+    collector = SectionTextCollector(ids)
+    collector.feed(content)
+    collector.close()
+
+    sections = {}
+    for item in compiled:
+        section_text = collector.section_text(item.element_id)
+        if section_text is not None:
+            sections[item.selector] = section_text
+    return sections
+
+
+BACKENDS = {
+    'soup': extract_with_soup,
+    'strainer': extract_with_strainer,
+    'lxml': extract_with_lxml,
+    'stream': extract_with_stream,
+}
+
+
+def available_backends() -> list:
+    """
+    Lists the extraction backends usable in the current environment.
+
+    Returns:
+        list: The names of the available backends.
+    """
+    return [name for name in BACKENDS if name != 'lxml' or importlib.util.find_spec('lxml') is not None]
+
+
+def extract_structures(content, selectors: list, backend: str = DEFAULT_BACKEND) -> dict:
+    """
+    Extracts directory structures from the HTML content of a webpage with the given backend. All
+    backends produce the same output; they differ in speed and in the dependencies they need.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        selectors (list): A list of CSS selectors or element IDs to identify the sections
+                          containing the directory structures.
+        backend (str): One of 'soup', 'strainer', 'lxml', 'stream', or 'auto' to use the
+                       SoupStrainer-restricted parse. Defaults to 'auto'.
+
+    Returns:
+        dict: A dictionary mapping each selector to its corresponding directory structure text.
+              If no content is found for a selector, it maps to an empty string.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == 'auto':
+        backend = 'strainer'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+
+    sections = BACKENDS[backend](content, compile_selectors(tuple(selectors)))
+
+    structures = {}
+    for selector in selectors:
+        if selector not in sections:
+            logging.info(f"No content found for selector: '{selector}'.")
+        structures[selector] = sections.get(selector, "")  # Ensuring inclusion even if no content is found
+
+    return structures
+
+
+def benchmark_backends(content, selectors: list, repeat: int = 5) -> dict:
+    """
+    Times every available backend on the same content and checks that they agree with the
+    reference BeautifulSoup backend.
+
+    Args:
+        content (bytes or str): The HTML content of the webpage.
+        selectors (list): A list of CSS selectors or element IDs.
+        repeat (int): The number of timed runs per backend; the best run is reported.
+
+    Returns:
+        dict: A dictionary mapping each backend name to a dictionary with 'seconds' (best run)
+              and 'identical' (whether its output matches the 'soup' backend) keys.
+    """
+    reference = extract_structures(content, selectors, 'soup')
+    results = {}
+    for backend in available_backends():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            structures = extract_structures(content, selectors, backend)
+            timings.append(time.perf_counter() - start)
+        results[backend] = {'seconds': min(timings), 'identical': structures == reference}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the HTML extraction backends and checks that their output is identical.')
+    parser.add_argument('--file',
+                        type=Path,
+                        help='Benchmark against a local HTML file instead of the configured documentation sources.')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=5,
+                        help='Number of timed runs per backend (default: 5).')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    # Load configuration
+    config = load_config(CONFIG_PATH)
+    sources = validate_and_get_sources(config)
+
+    if args.file:
+        selectors = list(dict.fromkeys(s for source in sources.values() for s in source['selectors']))
+        pages = {str(args.file): (args.file.read_bytes(), selectors)}
+    else:
+        import requests
+        pages = {
+            source['docs_url']: (requests.get(source['docs_url']).content, source['selectors'])
+            for source in sources.values()
+        }
+
+    for page, (content, selectors) in pages.items():
+        results = benchmark_backends(content, selectors, args.repeat)
+        baseline = results['soup']['seconds']
+        logging.info(f"{page} ({len(content)} bytes)")
+        for backend, result in results.items():
+            logging.info(f"  {backend:<10} {result['seconds'] * 1000:8.2f} ms  "
+                         f"{baseline / result['seconds']:5.1f}x  "
+                         f"{'identical' if result['identical'] else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
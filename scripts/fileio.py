@@ -0,0 +1,54 @@
+from pathlib import Path
+import os
+import stat
+import tempfile
+
+
+def atomic_write(path, data: bytes):
+    """
+    Writes a file atomically, through a temporary sibling file renamed over the target, so readers
+    never observe a partially written file. The target's permissions are kept when it already exists.
+
+    Args:
+        path (str or Path): The path of the file. Its directory must exist.
+        data (bytes): The new content.
+    """
+    path = Path(path)
+    with tempfile.NamedTemporaryFile('wb', dir=path.parent, prefix=f".{path.name}.", delete=False) as file:
+        try:
+            file.write(data)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    try:
+        os.chmod(file.name, stat.S_IMODE(os.stat(path).st_mode))
+    except OSError:
+        pass  # A new file
+    os.replace(file.name, path)
+
+
+def write_text_if_changed(path, content: str, current: str = None) -> bool:
+    """
+    Writes a text file atomically, through a temporary sibling file renamed over the target, and
+    keeps the target's permissions. Nothing is written (and the modification time is left alone)
+    if the content is unchanged.
+
+    Args:
+        path (str or Path): The path of the file.
+        content (str): The new content.
+        current (str, optional): The current content, if already read; otherwise it is read from `path`.
+
+    Returns:
+        bool: True if the file was written, False if it was already up to date.
+    """
+    path = Path(path)
+    if current is None:
+        try:
+            current = path.read_text(encoding='utf-8')
+        except OSError:
+            pass
+    if current == content:
+        return False
+
+    atomic_write(path, content.encode('utf-8'))
+    return True
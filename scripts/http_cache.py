@@ -0,0 +1,116 @@
+from fileio import atomic_write
+
+from pathlib import Path
+import hashlib
+import json
+
+
+def cache_key(url: str, selectors: list) -> str:
+    """
+    Builds the cache key for fetching a set of selectors from a URL. The selectors are part of the
+    key so that sources sharing a page but extracting different sections keep separate entries.
+
+    Args:
+        url (str): The URL of the webpage.
+        selectors (list): The selectors extracted from the webpage.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{url}#{','.join(selectors)}"
+
+
+def cache_entry_path(cache_dir, key: str) -> Path:
+    """
+    Computes the on-disk location of a cache entry. The file is named after the SHA-256 digest
+    of the key so that arbitrary URLs map to safe file names.
+
+    Args:
+        cache_dir (str or Path): The directory holding the HTTP cache.
+        key (str): The cache key, as returned by `cache_key`.
+
+    Returns:
+        Path: The path of the JSON file holding the entry.
+    """
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return Path(cache_dir) / f"{digest}.json"
+
+
+def load_cache_entry(cache_dir, key: str):
+    """
+    Loads a cache entry.
+
+    Args:
+        cache_dir (str or Path): The directory holding the HTTP cache.
+        key (str): The cache key, as returned by `cache_key`.
+
+    Returns:
+        dict or None: The cached entry with 'key', 'etag', 'last_modified' and 'structures' keys,
+                      or None if no usable entry exists.
+    """
+    try:
+        with open(cache_entry_path(cache_dir, key), 'r', encoding='utf-8') as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # Guard against digest collisions and hand-edited entries
+    if entry.get('key') != key:
+        return None
+    return entry
+
+
+def store_cache_entry(cache_dir, key: str, etag, last_modified, structures: dict):
+    """
+    Stores the validators and extracted structures of a response.
+
+    Args:
+        cache_dir (str or Path): The directory holding the HTTP cache.
+        key (str): The cache key, as returned by `cache_key`.
+        etag (str or None): The ETag validator returned by the server.
+        last_modified (str or None): The Last-Modified validator returned by the server.
+        structures (dict): The directory structures extracted from the response, keyed by selector.
+    """
+    entry = {
+        'key': key,
+        'etag': etag,
+        'last_modified': last_modified,
+        'structures': structures,
+    }
+    path = cache_entry_path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, json.dumps(entry, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+def invalidate_cache_entry(cache_dir, key: str):
+    """
+    Removes a cache entry so the next request performs a full, unconditional fetch.
+
+    Args:
+        cache_dir (str or Path): The directory holding the HTTP cache.
+        key (str): The cache key, as returned by `cache_key`.
+    """
+    try:
+        cache_entry_path(cache_dir, key).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def conditional_headers(entry) -> dict:
+    """
+    Builds the conditional request headers for a cached entry.
+
+    Args:
+        entry (dict or None): The cached entry, as returned by `load_cache_entry`.
+
+    Returns:
+        dict: The 'If-None-Match' and/or 'If-Modified-Since' headers, or an empty dictionary if
+              the entry carries no validators.
+    """
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
@@ -0,0 +1,121 @@
+from fileio import atomic_write
+
+from pathlib import Path
+import hashlib
+import json
+
+# Bump whenever parsing or rendering changes, so that manifests written by older code are discarded
+MANIFEST_VERSION = 2
+MANIFEST_TARGETS = ('readme', 'templates')
+
+
+def content_hash(content) -> str:
+    """
+    Computes a stable SHA-256 hash of a layout's structure text, parsed tree or rendered section.
+    Non-string values are serialized to canonical JSON first; mappings other than dictionaries,
+    such as parsed structure nodes, are serialized as dictionaries.
+
+    Args:
+        content (str, list or dict): The content to hash.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    if not isinstance(content, str):
+        content = canonical_json(content)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def canonical_json(content) -> str:
+    """
+    Serializes a parsed tree or any other JSON-compatible value to the canonical JSON hashed by
+    `content_hash`: sorted keys, no whitespace, and mappings such as structure nodes as dictionaries.
+
+    Args:
+        content (list or dict): The value to serialize.
+
+    Returns:
+        str: The canonical JSON text.
+    """
+    return json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=dict)
+
+
+def empty_manifest() -> dict:
+    """
+    Creates a manifest without any recorded layouts.
+
+    Returns:
+        dict: A manifest with a version stamp and an empty entry table per target.
+    """
+    manifest = {'version': MANIFEST_VERSION}
+    for target in MANIFEST_TARGETS:
+        manifest[target] = {}
+    return manifest
+
+
+def load_manifest(manifest_path) -> dict:
+    """
+    Loads the layout manifest, which records per target ('readme' and 'templates') the hashes of each
+    layout's structure text and of the output last produced from it.
+
+    Args:
+        manifest_path (str or Path): The path to the manifest file.
+
+    Returns:
+        dict: The loaded manifest, or an empty manifest if the file is missing, unreadable or was
+              written by an incompatible version.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return empty_manifest()
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return empty_manifest()
+
+    for target in MANIFEST_TARGETS:
+        if not isinstance(manifest.get(target), dict):
+            manifest[target] = {}
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_path) -> bool:
+    """
+    Saves the layout manifest atomically. The file is left untouched if its content would not change.
+
+    Args:
+        manifest (dict): The manifest to save.
+        manifest_path (str or Path): The path to the manifest file.
+
+    Returns:
+        bool: True if the file was written, False if it was already up to date.
+    """
+    manifest_path = Path(manifest_path)
+    content = json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False) + '\n'
+
+    try:
+        if manifest_path.read_text(encoding='utf-8') == content:
+            return False
+    except OSError:
+        pass
+
+    atomic_write(manifest_path, content.encode('utf-8'))
+    return True
+
+
+def is_unchanged(entries, layout_name: str, key: str, value_hash: str) -> bool:
+    """
+    Checks whether a hash recorded for a layout matches the given one.
+
+    Args:
+        entries (dict or None): The manifest entries of one target, keyed by layout name. None disables
+                                the check, so every layout counts as changed.
+        layout_name (str): The layout name.
+        key (str): The recorded hash to compare, e.g. 'structure_hash'.
+        value_hash (str): The current hash.
+
+    Returns:
+        bool: True if the recorded hash equals `value_hash`.
+    """
+    return entries is not None and entries.get(layout_name, {}).get(key) == value_hash
@@ -0,0 +1,131 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import json
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_spans = {}  # Stage name -> [number of runs, total seconds]
+_counters = Counter()
+
+_DISABLED_SPAN = nullcontext()
+
+
+def enable_metrics(enabled: bool = True):
+    """
+    Enables or disables metrics collection. While disabled, spans and counters are no-ops, so
+    instrumented code runs at practically full speed.
+
+    Args:
+        enabled (bool): Whether to collect metrics.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def reset_metrics():
+    """Discards every recorded span and counter."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+class _Span:
+    """A timing span that adds its elapsed wall time to a named stage when it exits."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            span = _spans.setdefault(self.name, [0, 0.0])
+            span[0] += 1
+            span[1] += elapsed
+        return False
+
+
+def timed(name: str):
+    """
+    Times a stage of the pipeline. Spans of the same name accumulate, and spans opened by concurrent
+    threads each record their own wall time.
+
+    Args:
+        name (str): The stage name, such as 'fetch' or 'sync.apply'.
+
+    Returns:
+        A context manager timing its block.
+    """
+    return _Span(name) if _enabled else _DISABLED_SPAN
+
+
+def increment(name: str, amount: int = 1):
+    """
+    Increments a counter.
+
+    Args:
+        name (str): The counter name, such as 'bytes_downloaded'.
+        amount (int): The amount to add.
+    """
+    if _enabled:
+        with _lock:
+            _counters[name] += amount
+
+
+def metrics_snapshot() -> dict:
+    """
+    Returns the metrics recorded so far.
+
+    Returns:
+        dict: A dictionary with 'spans' (stage name to a dictionary with 'count' and 'seconds' keys)
+              and 'counters' (counter name to value) keys, sorted by name.
+    """
+    with _lock:
+        return {
+            'spans': {name: {'count': runs, 'seconds': round(seconds, 6)}
+                      for name, (runs, seconds) in sorted(_spans.items())},
+            'counters': dict(sorted(_counters.items())),
+        }
+
+
+def write_metrics(metrics_path):
+    """
+    Writes the metrics recorded so far to a JSON file.
+
+    Args:
+        metrics_path (str or Path): The path of the JSON file.
+    """
+    Path(metrics_path).write_text(json.dumps(metrics_snapshot(), indent=2) + '\n', encoding='utf-8')
+
+
+@contextmanager
+def profiled(profile_path=None):
+    """
+    Profiles a block with cProfile and dumps the statistics, for inspection with `pstats` or
+    tools like snakeviz. Only the calling thread is profiled, so work done by thread pools shows up
+    as time spent waiting for their results. Without a path, the block runs unprofiled.
+
+    Args:
+        profile_path (str or Path, optional): The path to dump the profile statistics to.
+    """
+    if profile_path is None:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
@@ -0,0 +1,196 @@
+from fileio import atomic_write
+from manifest import content_hash
+from metrics import increment, timed
+from parse import PARSER_VERSION, StructureNode, parse_directory_structure
+from render import iter_structure
+
+from collections import OrderedDict
+from pathlib import Path
+import marshal
+import os
+import threading
+import zlib
+
+PARSE_CACHE_NAME = 'parsed'
+PARSE_CACHE_MAGIC = b'ATLP'
+PARSE_CACHE_FORMAT = 1
+DEFAULT_MEMORY_ENTRIES = 128
+DEFAULT_DISK_BYTES = 64 * 1024 * 1024
+
+# Trees written by another parser or serialization format are stale, and treated as missing
+_STAMP = (PARSE_CACHE_FORMAT, PARSER_VERSION, marshal.version)
+
+_lock = threading.Lock()
+_memory = OrderedDict()  # Structure text hash -> parsed structure, least recently used first
+_memory_entries = DEFAULT_MEMORY_ENTRIES
+_disk_dir = None
+_disk_bytes = DEFAULT_DISK_BYTES
+
+
+def configure_parse_cache(cache_dir=None, max_memory_entries=DEFAULT_MEMORY_ENTRIES, max_disk_bytes=DEFAULT_DISK_BYTES):
+    """
+    Configures the parse cache shared by every caller of `parse_structure_cached` in the process.
+
+    Args:
+        cache_dir (str or Path, optional): The directory of the on-disk cache, which keeps parsed trees
+                                           across runs. The on-disk cache is disabled if None.
+        max_memory_entries (int): The number of trees kept in memory.
+        max_disk_bytes (int): The total size of the on-disk cache, beyond which the least recently used
+                              trees are evicted.
+    """
+    global _memory_entries, _disk_dir, _disk_bytes
+    with _lock:
+        _memory_entries = max_memory_entries
+        _disk_dir = Path(cache_dir) / PARSE_CACHE_NAME if cache_dir else None
+        _disk_bytes = max_disk_bytes
+        while len(_memory) > _memory_entries:
+            _memory.popitem(last=False)
+
+
+def configure_parse_cache_from_config():
+    """Enables the on-disk parse cache in the configured CACHE_DIR, if caching is enabled."""
+    from config import CONFIG_PATH, get_cache_dir, load_config
+
+    configure_parse_cache(get_cache_dir(load_config(CONFIG_PATH)))
+
+
+def clear_parse_cache():
+    """Discards the trees kept in memory. The on-disk cache is left alone."""
+    with _lock:
+        _memory.clear()
+
+
+def encode_structure(structure) -> bytes:
+    """
+    Serializes a parsed structure into a compact binary form: the nodes in document order as three
+    flat columns (depth and type, path, comment), marshalled and compressed.
+
+    Args:
+        structure (list): The parsed directory structure.
+
+    Returns:
+        bytes: The serialized structure, starting with a magic number and version stamp.
+    """
+    shapes, paths, comments = [], [], []
+    for depth, item, _ in iter_structure(structure):
+        shapes.append(depth * 2 + (item['type'] == 'directory'))
+        paths.append(item['path'])
+        comments.append(item['comment'])
+    return PARSE_CACHE_MAGIC + zlib.compress(marshal.dumps((_STAMP, tuple(shapes), tuple(paths), tuple(comments))))
+
+
+def decode_structure(data: bytes):
+    """
+    Deserializes a structure serialized by `encode_structure`.
+
+    Args:
+        data (bytes): The serialized structure.
+
+    Returns:
+        list or None: The parsed directory structure, or None if the data is corrupt or was written by
+                      another parser version or format.
+    """
+    if not data.startswith(PARSE_CACHE_MAGIC):
+        return None
+    try:
+        stamp, shapes, paths, comments = marshal.loads(zlib.decompress(data[len(PARSE_CACHE_MAGIC):]))
+    except (ValueError, TypeError, EOFError, zlib.error):
+        return None
+    if stamp != _STAMP:
+        return None
+
+    root_children = []
+    children_stack = [root_children]
+    for shape, path, comment in zip(shapes, paths, comments):
+        depth = shape >> 1
+        if len(children_stack) > depth + 1:
+            del children_stack[depth + 1:]
+        if shape & 1:
+            node = StructureNode('directory', path, comment, [])
+            children_stack[-1].append(node)
+            children_stack.append(node.children)
+        else:
+            children_stack[-1].append(StructureNode('file', path, comment, None))
+    return root_children
+
+
+def _disk_path(disk_dir: Path, structure_hash: str) -> Path:
+    """Computes the path of a tree in the on-disk cache."""
+    return disk_dir / f"{structure_hash}.bin"
+
+
+def _load_from_disk(disk_dir: Path, structure_hash: str):
+    """Loads a tree from the on-disk cache, marking it as recently used, or returns None."""
+    path = _disk_path(disk_dir, structure_hash)
+    try:
+        structure = decode_structure(path.read_bytes())
+        if structure is not None:
+            os.utime(path)
+    except OSError:
+        return None
+    return structure
+
+
+def _store_on_disk(disk_dir: Path, structure_hash: str, structure, max_bytes: int):
+    """Stores a tree in the on-disk cache atomically, then evicts the least recently used trees over budget."""
+    try:
+        disk_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(_disk_path(disk_dir, structure_hash), encode_structure(structure))
+
+        with os.scandir(disk_dir) as entries:
+            files = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                     for entry in entries if entry.name.endswith('.bin')]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            os.unlink(path)
+            total -= size
+            increment('parse_cache_evictions')
+    except OSError:
+        pass  # The cache is an optimization; a read-only or full disk must not fail the run
+
+
+def parse_structure_cached(structure_text: str, structure_hash: str = None):
+    """
+    Parses a directory structure text like `parse.parse_directory_structure`, but parses each distinct
+    text at most once. Trees are kept in an in-process LRU cache shared by every caller, backed by
+    the on-disk cache when one is configured, so that commands run later can reuse them too.
+
+    The returned tree is shared with every other caller parsing the same text, and must not be modified.
+
+    Args:
+        structure_text (str): The directory structure text.
+        structure_hash (str, optional): The `manifest.content_hash` of the text, if already computed.
+
+    Returns:
+        list: The parsed directory structure.
+    """
+    structure_hash = structure_hash or content_hash(structure_text)
+    with _lock:
+        structure = _memory.get(structure_hash)
+        if structure is not None:
+            _memory.move_to_end(structure_hash)
+        disk_dir, max_bytes = _disk_dir, _disk_bytes
+    if structure is not None:
+        increment('parse_cache_hits')
+        return structure
+
+    if disk_dir is not None:
+        with timed('parse_cache.load'):
+            structure = _load_from_disk(disk_dir, structure_hash)
+    if structure is not None:
+        increment('parse_cache_disk_hits')
+    else:
+        increment('parse_cache_misses')
+        structure = parse_directory_structure(structure_text)
+        if disk_dir is not None:
+            with timed('parse_cache.store'):
+                _store_on_disk(disk_dir, structure_hash, structure, max_bytes)
+
+    with _lock:
+        _memory[structure_hash] = structure
+        _memory.move_to_end(structure_hash)
+        while len(_memory) > _memory_entries:
+            _memory.popitem(last=False)
+    return structure
@@ -0,0 +1,157 @@
+from extract import DEFAULT_BACKEND
+from manifest import content_hash, is_unchanged
+from metrics import timed
+from parse_cache import parse_structure_cached
+from retrieve import (
+    DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    DEFAULT_MAX_RESPONSE_BYTES,
+    DEFAULT_MAX_WORKERS,
+    create_session,
+    fetch_directory_structures_if_modified,
+    load_cached_structures,
+)
+from update import update_layout
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+DEFAULT_QUEUE_SIZE = 16
+
+_DONE = None  # Queue sentinel telling a worker that its predecessor stage is finished
+
+
+async def run_pipeline(sources: dict, cache_dir, base_path, manifest: dict, keep_parsed=True, sync=True,
+                       dry_run=False, subtree_sync=False, jobs=1, stream=False, backend=DEFAULT_BACKEND,
+                       queue_size=DEFAULT_QUEUE_SIZE, staged=False) -> dict:
+    """
+    Fetches, parses and syncs layouts as a pipeline of stages connected by bounded queues, instead of
+    running each stage for every layout before the next one starts. Each source's structures go to the
+    parsers as soon as they are extracted, and each parsed layout goes on to be synced, so network waits,
+    parsing and disk writes overlap; with many sources, the run takes about as long as the slowest
+    chain. A stage blocks when its output queue is full, which bounds the layouts in flight.
+
+    Blocking work runs in thread pools: fetches in one sized like `retrieve.fetch_all_directory_structures`,
+    and parsing and syncing in one of `jobs` + 1 threads. A layout is only parsed if the README or its
+    template directory needs it, according to the manifest. Unchanged sources are served from the HTTP
+    cache, and their layouts flow through the pipeline like the others.
+
+    Args:
+        sources (dict): The documentation sources, as returned by `config.validate_and_get_sources`.
+        cache_dir (str or Path, optional): The HTTP cache directory. Caching is disabled if None.
+        base_path (Path): The base path where the templates should be created.
+        manifest (dict): The layout manifest. It is only read; see `update.collect_layout_outcomes`.
+        keep_parsed (bool): Whether to keep the parsed trees, for rendering the README.
+        sync (bool): Whether to sync the template directories.
+        dry_run (bool, optional): Whether to only plan the changes. Defaults to False.
+        subtree_sync (bool, optional): Whether to sync only the changed subtrees. See `update.update_layout`.
+        jobs (int, optional): The number of layouts synced concurrently. Defaults to 1.
+        stream (bool): Whether to stream responses and stop reading once every selector is resolved.
+        backend (str): The extraction backend to use.
+        queue_size (int): The capacity of each queue between two stages.
+        staged (bool, optional): Whether to swap each synced layout into place atomically. See `update.update_layout`.
+
+    Returns:
+        dict: A dictionary with 'results' (the structure text of each (source, selector) tuple, in
+              configuration order), 'modified' (whether any source changed since the cached fetch),
+              'parsed' (the parsed trees kept for the README, keyed by layout name) and 'outcomes'
+              (the outcome of `update.update_layout`, or the exception it raised, keyed by layout name
+              in configuration order) keys.
+
+    Raises:
+        ExceptionGroup: If fetching any of the sources fails.
+    """
+    loop = asyncio.get_running_loop()
+    jobs = max(1, jobs)
+    single_source = len(sources) <= 1
+    readme_entries, template_entries = manifest['readme'], manifest['templates']
+
+    fetched = {}
+    texts = {}
+    parsed = {}
+    outcomes = {}
+    modified = False
+    parse_queue = asyncio.Queue(queue_size)
+    sync_queue = asyncio.Queue(queue_size)
+
+    with create_session(DEFAULT_MAX_CONNECTIONS_PER_HOST) as session, \
+            ThreadPoolExecutor(max_workers=max(1, min(DEFAULT_MAX_WORKERS, len(sources)))) as fetch_executor, \
+            ThreadPoolExecutor(max_workers=jobs + 1) as work_executor:
+
+        async def fetch(source_name, source):
+            nonlocal modified
+            structures = await loop.run_in_executor(
+                fetch_executor, fetch_directory_structures_if_modified, source['docs_url'], source['selectors'],
+                cache_dir, session, stream, DEFAULT_MAX_RESPONSE_BYTES, backend)
+            if structures is None:
+                structures = load_cached_structures(cache_dir, source)
+            else:
+                modified = True
+
+            fetched[source_name] = structures
+            for selector, structure_text in structures.items():
+                layout_name = selector if single_source else f"{source_name}/{selector}"
+                texts[layout_name] = structure_text
+                await parse_queue.put(layout_name)
+
+        async def parse_worker():
+            while (layout_name := await parse_queue.get()) is not _DONE:
+                structure_hash = content_hash(texts[layout_name])
+                if ((keep_parsed and not is_unchanged(readme_entries, layout_name, 'structure_hash', structure_hash))
+                        or (sync and not is_unchanged(template_entries, layout_name, 'structure_hash', structure_hash))):
+                    try:
+                        parsed_structure = await loop.run_in_executor(work_executor, parse_structure_cached,
+                                                                      texts[layout_name], structure_hash)
+                    except Exception as e:
+                        # Failed layouts are reported with the others, like the sync failures
+                        parsed_structure = e
+                    else:
+                        if keep_parsed:
+                            parsed[layout_name] = parsed_structure
+                else:
+                    parsed_structure = None  # Skipped by the README and sync stages alike
+                if sync:
+                    await sync_queue.put((layout_name, parsed_structure))
+
+        async def sync_worker():
+            while (item := await sync_queue.get()) is not _DONE:
+                layout_name, parsed_structure = item
+                if isinstance(parsed_structure, Exception):
+                    outcomes[layout_name] = parsed_structure
+                    continue
+                try:
+                    outcomes[layout_name] = await loop.run_in_executor(
+                        work_executor, update_layout, layout_name, texts[layout_name], base_path,
+                        template_entries.get(layout_name), dry_run, parsed_structure, subtree_sync, staged)
+                except Exception as e:
+                    outcomes[layout_name] = e
+
+        async def fetch_all():
+            async with asyncio.TaskGroup() as fetches:
+                for source_name, source in sources.items():
+                    fetches.create_task(fetch(source_name, source))
+            await parse_queue.put(_DONE)  # A single parser: parsing holds the GIL anyway
+
+        async def parse_all():
+            await parse_worker()
+            for _ in range(jobs if sync else 0):
+                await sync_queue.put(_DONE)
+
+        with timed('pipeline'):
+            async with asyncio.TaskGroup() as stages:
+                stages.create_task(fetch_all())
+                stages.create_task(parse_all())
+                for _ in range(jobs if sync else 0):
+                    stages.create_task(sync_worker())
+
+    results = {}
+    for source_name in sources:
+        for selector, structure_text in fetched[source_name].items():
+            results[(source_name, selector)] = structure_text
+    layout_names = [selector if single_source else f"{source_name}/{selector}" for source_name, selector in results]
+
+    return {
+        'results': results,
+        'modified': modified,
+        'parsed': parsed,
+        'outcomes': {layout_name: outcomes[layout_name] for layout_name in layout_names if layout_name in outcomes},
+    }
@@ -0,0 +1,109 @@
+from collections import namedtuple
+import re
+
+TEMPLATE_START = "<!-- TEMPLATE_START -->"
+TEMPLATE_END = "<!-- TEMPLATE_END -->"
+LAYOUT_START = "<!-- LAYOUT_START: {} -->"
+LAYOUT_END = "<!-- LAYOUT_END: {} -->"
+
+# Matches every marker in a single scan; layout names never contain whitespace or '>'
+MARKER_PATTERN = re.compile(r'<!-- (TEMPLATE_START|TEMPLATE_END|LAYOUT_START|LAYOUT_END)(?:: ([^\s>]+))? -->')
+
+ReadmeSections = namedtuple('ReadmeSections', ['start', 'end', 'layouts'])
+"""Offsets of the template block's content (`start`, `end`) and of each layout section's content, keyed by name."""
+
+
+def scan_readme_sections(content: str) -> ReadmeSections:
+    """
+    Locates the template block and the layout sections inside it in a single scan over the README.
+    A layout section is the text between its LAYOUT_START marker line and its LAYOUT_END marker.
+
+    Args:
+        content (str): The README content.
+
+    Returns:
+        ReadmeSections: The content offsets of the template block, and an ordered mapping of layout
+                        name to the (start, end) offsets of its section. Layout markers that are
+                        unbalanced or outside the template block are ignored.
+
+    Raises:
+        ValueError: If the TEMPLATE_START and TEMPLATE_END markers are missing.
+    """
+    start = end = None
+    layouts = {}
+    open_layout = None
+    for match in MARKER_PATTERN.finditer(content):
+        kind, name = match.groups()
+        if kind == 'TEMPLATE_START' and start is None:
+            start = match.end()
+        elif kind == 'TEMPLATE_END' and start is not None:
+            end = match.start()
+            break
+        elif start is None:
+            continue
+        elif kind == 'LAYOUT_START' and name:
+            # The section starts on the line after its marker
+            section_start = match.end() + 1 if content.startswith('\n', match.end()) else match.end()
+            open_layout = (name, section_start)
+        elif kind == 'LAYOUT_END' and open_layout is not None and open_layout[0] == name:
+            layouts[name] = (open_layout[1], match.start())
+            open_layout = None
+
+    if start is None or end is None:
+        raise ValueError(f"README is missing the '{TEMPLATE_START}' and '{TEMPLATE_END}' markers.")
+
+    return ReadmeSections(start, end, layouts)
+
+
+def build_template_block(sections: dict) -> str:
+    """
+    Builds the full content of the template block, wrapping every layout section in its markers.
+
+    Args:
+        sections (dict): An ordered mapping of layout name to its rendered README section.
+
+    Returns:
+        str: The text to place between the TEMPLATE_START and TEMPLATE_END markers.
+    """
+    blocks = [f"{LAYOUT_START.format(name)}\n{section}{LAYOUT_END.format(name)}\n"
+              for name, section in sections.items()]
+    return "\n" + "\n".join(blocks) + "\n"
+
+
+def patch_readme(content: str, scanned: ReadmeSections, sections: dict):
+    """
+    Splices layout sections into the README. When the README already holds exactly these layouts,
+    in the same order, only the sections whose text differs are replaced, using the offsets found
+    by `scan_readme_sections`. Otherwise (on the first run with markers, or when layouts were added,
+    removed or reordered) the whole template block is rebuilt.
+
+    Args:
+        content (str): The current README content.
+        scanned (ReadmeSections): The offsets found in `content` by `scan_readme_sections`.
+        sections (dict): An ordered mapping of layout name to its rendered README section.
+
+    Returns:
+        tuple: The patched README content (str) and the names of the layouts whose section changed (list).
+    """
+    if list(scanned.layouts) != list(sections):
+        changed = [name for name, section in sections.items()
+                   if name not in scanned.layouts or content[slice(*scanned.layouts[name])] != section]
+        return f"{content[:scanned.start]}{build_template_block(sections)}{content[scanned.end:]}", changed
+
+    pieces = []
+    changed = []
+    position = 0
+    for name, section in sections.items():
+        section_start, section_end = scanned.layouts[name]
+        if content[section_start:section_end] == section:
+            continue
+        pieces.append(content[position:section_start])
+        pieces.append(section)
+        position = section_end
+        changed.append(name)
+
+    if not changed:
+        return content, changed
+
+    pieces.append(content[position:])
+    return ''.join(pieces), changed
@@ -0,0 +1,415 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from pathlib import Path
+from shutil import rmtree
+import errno
+import os
+import secrets
+import stat
+
+Operation = namedtuple('Operation', ['action', 'path', 'content'])
+"""
+A single filesystem change: 'mkdir', 'create', 'rewrite', 'delete' or 'move' of `path`, with file
+`content` in bytes, or the destination path of a move.
+"""
+
+
+def expected_file_content(item, write_comments=True):
+    """
+    Computes the content a template file should have.
+
+    Args:
+        item (dict): The file entry of the parsed directory structure.
+        write_comments (bool, optional): Whether files carry their comment as a header. Defaults to True.
+
+    Returns:
+        bytes or None: The expected content, or None if the content of an existing file is left as is.
+    """
+    if write_comments and 'comment' in item:
+        return f"# {item['comment']}\n".encode('utf-8')
+    return None
+
+
+def build_expected_index(structure) -> dict:
+    """
+    Flattens a parsed directory structure into an index of the relative paths it defines. Paths are
+    plain '/'-separated strings, which are cheap to hash and compare. Intermediate directories of
+    entries whose name contains a '/' are indexed as well. When the same path appears more than once,
+    directories merge their children and the last file entry wins.
+
+    Args:
+        structure (list): The directory structure as a list of dictionaries.
+
+    Returns:
+        dict: An ordered mapping of relative path to its structure item (or None for an implied
+              intermediate directory), with every directory listed before its contents.
+    """
+    index = {}
+    pending = [('', structure)]
+    while pending:
+        parent, items = pending.pop()
+        for item in items:
+            relative_path = f"{parent}{item['path']}"
+
+            # Index the implied parents of multi-segment names, like 'roles/common'
+            segments = relative_path.split('/')
+            for depth in range(1, len(segments)):
+                index.setdefault('/'.join(segments[:depth]), None)
+
+            if item['type'] == 'directory':
+                if not isinstance(index.get(relative_path), dict) or index[relative_path]['type'] != 'directory':
+                    index[relative_path] = item
+                pending.append((f"{relative_path}/", item.get('children') or []))
+            else:
+                index[relative_path] = item
+
+    return index
+
+
+def _is_expected_dir(index, relative_path) -> bool:
+    """Checks whether an indexed path is a directory (explicit or implied)."""
+    item = index[relative_path]
+    return item is None or item['type'] == 'directory'
+
+
+def _differs(entry, content: bytes) -> bool:
+    """Checks whether an existing file's content differs, comparing sizes before reading."""
+    if entry.stat().st_size != len(content):
+        return True
+    with open(entry.path, 'rb') as file:
+        return file.read() != content
+
+
+def plan_template_layout(base_path, structure, write_comments=True, keep=()):
+    """
+    Plans the minimal set of filesystem operations that bring the directory at `base_path` in line
+    with the given structure.
+
+    The structure is first flattened into an index of expected relative paths. The existing tree is
+    then walked once with `os.scandir`: every entry is looked up in the index, unexpected entries are
+    marked for deletion without descending into them, and expected directories are descended into.
+    Files are only read when their size matches the expected content, and only files whose content
+    differs are rewritten. Entries of the wrong type (a file where a directory is expected, or vice
+    versa) are deleted and recreated. Finally, expected entries that were not found are created.
+
+    Args:
+        base_path (str or Path): The base path where the directory structure starts.
+        structure (list): The directory structure as a list of dictionaries.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+        keep (tuple, optional): Patterns of relative paths, such as '.git', that are left alone instead
+                                of being deleted when the structure does not define them.
+
+    Returns:
+        list: A list of Operation tuples, in the order they must be applied: deletions first, then
+              directory and file creations (parents before children), then rewrites.
+    """
+    base_path = Path(base_path)
+    index = build_expected_index(structure)
+
+    deletions = []
+    creations = []
+    rewrites = []
+    found = set()
+
+    if base_path.is_dir():
+        pending = [(str(base_path), '')]
+    else:
+        if base_path.exists() or base_path.is_symlink():
+            deletions.append(Operation('delete', base_path, None))
+        creations.append(Operation('mkdir', base_path, None))
+        pending = []
+
+    while pending:
+        dir_path, parent = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                relative_path = f"{parent}{entry.name}"
+                if relative_path not in index:
+                    if keep and any(fnmatchcase(relative_path, pattern) for pattern in keep):
+                        continue
+                    # Prune the whole unexpected subtree without descending into it
+                    deletions.append(Operation('delete', Path(entry.path), None))
+                    continue
+
+                if _is_expected_dir(index, relative_path):
+                    if entry.is_dir(follow_symlinks=False):
+                        found.add(relative_path)
+                        pending.append((entry.path, f"{relative_path}/"))
+                    else:
+                        deletions.append(Operation('delete', Path(entry.path), None))
+                    continue
+
+                if not entry.is_file(follow_symlinks=False):
+                    deletions.append(Operation('delete', Path(entry.path), None))
+                    continue
+
+                found.add(relative_path)
+                content = expected_file_content(index[relative_path], write_comments)
+                if content is not None and _differs(entry, content):
+                    rewrites.append(Operation('rewrite', Path(entry.path), content))
+
+    for relative_path, item in index.items():
+        if relative_path in found:
+            continue
+        if _is_expected_dir(index, relative_path):
+            creations.append(Operation('mkdir', base_path / relative_path, None))
+        else:
+            content = expected_file_content(item, write_comments)
+            creations.append(Operation('create', base_path / relative_path, content if content is not None else b''))
+
+    return deletions + creations + rewrites
+
+
+def _delete_batch(parent, names):
+    """
+    Deletes entries of one directory relative to a single open directory descriptor, so that the
+    parent path is resolved once per batch instead of once per entry.
+    """
+    if os.unlink not in os.supports_dir_fd:
+        for name in names:
+            _delete_path(os.path.join(parent, name))
+        return
+
+    dir_fd = os.open(parent, os.O_RDONLY)
+    try:
+        for name in names:
+            if stat.S_ISDIR(os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_mode):
+                rmtree(os.path.join(parent, name))
+            else:
+                os.unlink(name, dir_fd=dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _delete_path(path):
+    """Deletes a file, symlink or whole directory tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        rmtree(path)
+    else:
+        os.unlink(path)
+
+
+def apply_plan(plan) -> dict:
+    """
+    Applies a plan produced by `plan_template_layout` in a single pass. Consecutive deletions are
+    grouped by parent directory and performed in batches.
+
+    Args:
+        plan (list): A list of Operation tuples.
+
+    Returns:
+        dict: The number of applied operations per action.
+    """
+    counts = {'mkdir': 0, 'create': 0, 'rewrite': 0, 'delete': 0, 'move': 0}
+
+    batch_parent, batch_names = None, []
+    for action, path, content in plan + [Operation(None, None, None)]:
+        if action == 'delete' and os.path.dirname(path) == batch_parent:
+            batch_names.append(os.path.basename(path))
+            counts[action] += 1
+            continue
+
+        # Flush the pending batch of deletions before anything else
+        if batch_names:
+            _delete_batch(batch_parent, batch_names)
+            batch_parent, batch_names = None, []
+
+        if action == 'delete':
+            batch_parent, batch_names = os.path.dirname(path), [os.path.basename(path)]
+        elif action == 'mkdir':
+            os.makedirs(path)
+        elif action in ('create', 'rewrite'):
+            with open(path, 'wb') as file:
+                file.write(content)
+        elif action == 'move':
+            os.replace(path, content)
+
+        if action is not None:
+            counts[action] += 1
+
+    return counts
+
+
+@contextmanager
+def layout_lock(base_path):
+    """
+    Holds an exclusive lock on a template directory, so that concurrent updaters of the same layout
+    run one after the other. The lock is an advisory `flock` on a hidden sibling file, which stays in
+    place because the directory itself is replaced by staged syncs. Platforms without `fcntl` are not
+    locked.
+
+    Args:
+        base_path (str or Path): The template directory.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Not a POSIX platform
+        yield
+        return
+
+    base_path = Path(base_path)
+    base_path.parent.mkdir(parents=True, exist_ok=True)
+    lock_fd = os.open(base_path.parent / f".{base_path.name}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(lock_fd)  # Releases the lock
+
+
+def _exchange_paths(source, destination) -> bool:
+    """
+    Atomically swaps two paths with renameat2(RENAME_EXCHANGE), so that `destination` is never
+    missing. Returns False where the call is not available, such as outside Linux.
+    """
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+
+    AT_FDCWD, RENAME_EXCHANGE = -100, 2
+    if renameat2(AT_FDCWD, os.fsencode(source), AT_FDCWD, os.fsencode(destination), RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False  # Old kernel or filesystem without support
+    raise OSError(error, os.strerror(error), str(source), None, str(destination))
+
+
+def _make_staging_dir(parent: Path, prefix: str) -> Path:
+    """
+    Creates a uniquely named directory. Unlike `tempfile.mkdtemp`, which makes it private, the
+    directory gets the default mode, as restricted by the umask.
+    """
+    while True:
+        path = parent / f"{prefix}{secrets.token_hex(4)}"
+        try:
+            os.mkdir(path)
+            return path
+        except FileExistsError:
+            continue
+
+
+def apply_plan_staged(base_path, structure, plan, write_comments=True) -> dict:
+    """
+    Applies a plan produced by `plan_template_layout` without ever exposing a half-updated directory.
+    The new tree is built in a hidden sibling directory: files the plan leaves alone are hardlinked
+    from the current tree, which costs one call per file, and the others are written. Every written
+    file and every directory is then flushed to disk in a single pass, and the staged tree is swapped
+    into place with one atomic rename, after which the old tree is removed. Readers therefore see
+    either the old or the new layout, never a mix. Callers should hold `layout_lock`.
+
+    Where paths cannot be exchanged atomically, the old tree is renamed aside first, so the directory
+    is briefly missing but never incomplete.
+
+    Args:
+        base_path (str or Path): The template directory.
+        structure (list): The directory structure the plan was computed for.
+        plan (list): A list of Operation tuples. Nothing is done if it is empty.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+
+    Returns:
+        dict: The number of directories created ('mkdir'), files written ('create') and files hardlinked
+              from the current tree ('link'), and whether the tree was swapped ('swap').
+    """
+    counts = {'mkdir': 0, 'create': 0, 'link': 0, 'swap': 0}
+    if not plan:
+        return counts
+
+    base_path = Path(base_path)
+    staging_prefix = f".{base_path.name}.staging-"
+    # Remove the staged trees of interrupted runs
+    for entry in base_path.parent.glob(f"{staging_prefix}*"):
+        _delete_path(entry)
+
+    changed = {str(path) for action, path, _ in plan if action in ('create', 'rewrite')}
+    existing = base_path.is_dir()
+    staging_path = _make_staging_dir(base_path.parent, staging_prefix)
+    try:
+        written = []
+        directories = [staging_path]
+        for relative_path, item in build_expected_index(structure).items():
+            staged = staging_path / relative_path
+            if item is None or item['type'] == 'directory':
+                os.mkdir(staged)
+                directories.append(staged)
+                counts['mkdir'] += 1
+                continue
+
+            current = base_path / relative_path
+            if existing and str(current) not in changed:
+                os.link(current, staged)
+                counts['link'] += 1
+            else:
+                content = expected_file_content(item, write_comments)
+                with open(staged, 'wb') as file:
+                    file.write(content if content is not None else b'')
+                written.append(staged)
+                counts['create'] += 1
+
+        # Flush everything once, rather than after each write
+        for path in written + directories:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        if not existing:
+            if base_path.exists() or base_path.is_symlink():
+                _delete_path(base_path)
+            os.rename(staging_path, base_path)
+        else:
+            # The swapped-in tree keeps the mode of the one it replaces
+            os.chmod(staging_path, stat.S_IMODE(os.stat(base_path).st_mode))
+            if not _exchange_paths(staging_path, base_path):
+                old_path = _make_staging_dir(base_path.parent, staging_prefix)
+                os.replace(base_path, old_path)
+                os.rename(staging_path, base_path)
+                staging_path = old_path
+        counts['swap'] = 1
+
+        parent_fd = os.open(base_path.parent, os.O_RDONLY)
+        try:
+            os.fsync(parent_fd)
+        finally:
+            os.close(parent_fd)
+    finally:
+        # After a swap, the staging path holds the old tree
+        if staging_path.exists():
+            _delete_path(staging_path)
+
+    return counts
+
+
+def format_plan(plan, base_path=None) -> str:
+    """
+    Formats a plan as one line per operation, for dry runs.
+
+    Args:
+        plan (list): A list of Operation tuples.
+        base_path (str or Path, optional): Paths are shown relative to this directory if given.
+
+    Returns:
+        str: The formatted plan, or a note that there is nothing to do.
+    """
+    if not plan:
+        return "No changes."
+
+    def display(path):
+        path = Path(path)
+        if base_path is not None and path != Path(base_path):
+            return path.relative_to(base_path)
+        return path
+
+    lines = []
+    for action, path, content in plan:
+        if action == 'move':
+            lines.append(f"{action:<8} {display(path)} -> {display(content)}")
+        else:
+            lines.append(f"{action:<8} {display(path)}")
+    return '\n'.join(lines)
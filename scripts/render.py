@@ -0,0 +1,242 @@
+import io
+import json
+import sys
+
+FORMATS = ('emoji', 'ascii', 'json', 'yaml')
+DEFAULT_COMMENT_INDENT = 30
+ICON_MAPPING = {'directory': '📁', 'file': '📄'}  # Icons for directory and file.
+
+
+def iter_structure(structure):
+    """
+    Walks a parsed directory structure depth-first without recursion, so that arbitrarily deep
+    trees never hit the recursion limit. Only one cursor per open directory is kept.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+
+    Yields:
+        tuple: The depth (int, 0 for top-level entries), the node, and whether the node is the last
+               of its siblings (bool), in document order.
+    """
+    stack = [(structure, 0)]  # Sibling list and index of the next node, per open directory
+    while stack:
+        items, index = stack[-1]
+        if index == len(items):
+            stack.pop()
+            continue
+
+        stack[-1] = (items, index + 1)
+        item = items[index]
+        yield len(stack) - 1, item, index == len(items) - 1
+
+        if item.get('children'):
+            stack.append((item['children'], 0))
+
+
+def _emoji_base_line(depth, item, indent):
+    """Builds the emoji tree line of a node, without its comment."""
+    icon = ICON_MAPPING.get(item['type'], '❓')  # Default to '❓' for unknown types.
+    return f"{' ' * (indent + depth * 4)}{icon} {item['path']}"
+
+
+def _ascii_base_line(ancestors_last, is_last, item):
+    """Builds the `tree`-style line of a node, without its comment."""
+    prefix = ''.join('    ' if last else '│   ' for last in ancestors_last)
+    suffix = '/' if item['type'] == 'directory' else ''
+    return f"{prefix}{'└── ' if is_last else '├── '}{item['path']}{suffix}"
+
+
+def measure_comment_column(structure, format='emoji', indent=0) -> int:
+    """
+    Computes, in a single pass over the structure, the column at which comments line up one space
+    after the widest line of the emoji or ASCII tree.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        format (str): The output format, 'emoji' or 'ascii'.
+        indent (int): Initial indentation of the emoji tree.
+
+    Returns:
+        int: The comment column.
+    """
+    width = 0
+    for depth, item, _ in iter_structure(structure):
+        if format == 'ascii':
+            line_width = 4 * (depth + 1) + len(item['path']) + (item['type'] == 'directory')
+        else:
+            line_width = indent + depth * 4 + 2 + len(item['path'])
+        width = max(width, line_width)
+    return width + 1
+
+
+def _write_commented_line(sink, base_line, comment, comment_indent):
+    """Writes a tree line with its comment aligned at `comment_indent`."""
+    # Prepare the comment string, if any, with alignment.
+    comment_str = f" # {comment}" if comment else ""
+    padding = max(comment_indent - len(base_line), 1)  # Ensure at least one space before the comment.
+    sink.write(f"{base_line}{' ' * padding}{comment_str}")
+
+
+def render_emoji(structure, sink, comment_indent=DEFAULT_COMMENT_INDENT, indent=0):
+    """
+    Writes the directory structure as an indented tree with directory and file icons and aligned
+    comments. Lines are separated by newlines, without a trailing newline.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        sink (file-like): The text stream to write to.
+        comment_indent (int or None): Column position to align comments. If None, it is computed
+                                      with `measure_comment_column`.
+        indent (int): Initial indentation of the tree.
+    """
+    if comment_indent is None:
+        comment_indent = measure_comment_column(structure, 'emoji', indent)
+
+    separator = ''
+    for depth, item, _ in iter_structure(structure):
+        sink.write(separator)
+        _write_commented_line(sink, _emoji_base_line(depth, item, indent), item['comment'], comment_indent)
+        separator = '\n'
+
+
+def render_ascii(structure, sink, comment_indent=None):
+    """
+    Writes the directory structure as a plain `tree`-style ASCII tree rooted at '.', with aligned
+    comments and a trailing newline.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        sink (file-like): The text stream to write to.
+        comment_indent (int or None): Column position to align comments. If None, it is computed
+                                      with `measure_comment_column`.
+    """
+    if comment_indent is None:
+        comment_indent = measure_comment_column(structure, 'ascii')
+
+    sink.write('.\n')
+    ancestors_last = []
+    for depth, item, is_last in iter_structure(structure):
+        del ancestors_last[depth:]
+        base_line = _ascii_base_line(ancestors_last, is_last, item)
+        if item['comment']:
+            _write_commented_line(sink, base_line, item['comment'], comment_indent)
+        else:
+            sink.write(base_line)
+        sink.write('\n')
+        ancestors_last.append(is_last)
+
+
+def render_json(structure, sink):
+    """
+    Writes the directory structure as a JSON array of nodes with 'type', 'path', 'comment' and
+    'children' keys, one node per line. Nodes are written as they are visited; only the closing
+    brackets of the open directories are kept.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        sink (file-like): The text stream to write to.
+    """
+    def close_directories(depth):
+        while len(open_directories) > depth:
+            directory_is_last = open_directories.pop()
+            sink.write(f"\n{'  ' * (len(open_directories) + 1)}]}}{'' if directory_is_last else ','}")
+
+    sink.write('[')
+    open_directories = []  # Whether each open directory is the last of its siblings
+    for depth, item, is_last in iter_structure(structure):
+        close_directories(depth)
+        sink.write(f"\n{'  ' * (depth + 1)}{{"
+                   f"\"type\": {json.dumps(item['type'])}, "
+                   f"\"path\": {json.dumps(item['path'], ensure_ascii=False)}, "
+                   f"\"comment\": {json.dumps(item['comment'], ensure_ascii=False)}, "
+                   f"\"children\": ")
+
+        if item.get('children'):
+            sink.write('[')
+            open_directories.append(is_last)
+            continue
+
+        sink.write(f"{'[]' if item['children'] is not None else 'null'}}}{'' if is_last else ','}")
+
+    close_directories(0)
+    sink.write('\n]\n' if structure else ']\n')
+
+
+def render_yaml(structure, sink):
+    """
+    Writes the directory structure as a YAML manifest: a sequence of nodes with 'type', 'path' and
+    'comment' keys, and a 'children' sequence for directories. Strings are written as double-quoted
+    scalars.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        sink (file-like): The text stream to write to.
+    """
+    if not structure:
+        sink.write('[]\n')
+        return
+
+    for depth, item, _ in iter_structure(structure):
+        indent = '    ' * depth
+        sink.write(f"{indent}- type: {item['type']}\n"
+                   f"{indent}  path: {json.dumps(item['path'], ensure_ascii=False)}\n"
+                   f"{indent}  comment: {json.dumps(item['comment'], ensure_ascii=False)}\n")
+        if item['type'] == 'directory':
+            sink.write(f"{indent}  children:{'' if item.get('children') else ' []'}\n")
+
+
+def render_structure(structure, sink, format='emoji', comment_indent=None):
+    """
+    Writes a parsed directory structure to a file-like sink in the given format. Rendering walks
+    the tree once (twice if the comment column has to be measured) and writes lines as it goes,
+    so it runs in linear time without building the output in memory.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        sink (file-like): The text stream to write to.
+        format (str): One of 'emoji', 'ascii', 'json' or 'yaml'. Defaults to 'emoji'.
+        comment_indent (int or None): Column position to align comments in the 'emoji' and 'ascii'
+                                      formats. If None, 'emoji' uses the README's fixed column and
+                                      'ascii' aligns comments after its widest line.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if format == 'emoji':
+        render_emoji(structure, sink, DEFAULT_COMMENT_INDENT if comment_indent is None else comment_indent)
+    elif format == 'ascii':
+        render_ascii(structure, sink, comment_indent)
+    elif format == 'json':
+        render_json(structure, sink)
+    elif format == 'yaml':
+        render_yaml(structure, sink)
+    else:
+        raise ValueError(f"Unknown output format '{format}'. Choose from: {', '.join(FORMATS)}.")
+
+
+def render_structure_string(structure, format='emoji', comment_indent=None) -> str:
+    """
+    Renders a parsed directory structure to a string in the given format.
+
+    Args:
+        structure (list): List of nested mappings representing the directory structure.
+        format (str): One of 'emoji', 'ascii', 'json' or 'yaml'. Defaults to 'emoji'.
+        comment_indent (int or None): Column position to align comments. See `render_structure`.
+
+    Returns:
+        str: The rendered structure.
+    """
+    buffer = io.StringIO()
+    render_structure(structure, buffer, format, comment_indent)
+    return buffer.getvalue()
+
+
+def main():
+    from cli import main as cli_main
+
+    cli_main(['render', *sys.argv[1:]])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,372 @@
-from config import (
-    CONFIG_PATH,
-    load_config,
-    validate_and_get_docs_url,
-    validate_and_get_selectors,
+from http_cache import (
+    cache_key,
+    conditional_headers,
+    load_cache_entry,
+    store_cache_entry,
 )
+from extract import DEFAULT_BACKEND, extract_structures
+from metrics import increment, timed
+from stream_extract import SectionTextCollector, selector_to_id
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import codecs
 import logging
 import requests
+import sys
 
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4
+DEFAULT_MAX_RESPONSE_BYTES = 16 * 1024 * 1024
+STREAM_CHUNK_SIZE = 16 * 1024
 
-def fetch_directory_structures(docs_url: str, selectors: list) -> dict:
+
+def extract_directory_structures(content, selectors: list, backend: str = DEFAULT_BACKEND) -> dict:
     """
-    Fetches directory structures from a webpage, handling both CSS selectors and element IDs.
-    This function requests the webpage content, parses it, and then searches for specified
-    selectors to extract directory structures, typically contained within <pre> tags.
+    Extracts directory structures from the HTML content of a webpage, handling both CSS selectors
+    and element IDs. Directory structures are expected to be contained within <pre> tags.
 
     Args:
-        docs_url (str): The URL of the webpage from which to fetch directory structures.
+        content (bytes or str): The HTML content of the webpage.
+        selectors (list): A list of CSS selectors or element IDs to identify the sections
+                          containing the directory structures.
+        backend (str): The extraction backend to use. See `extract.extract_structures`.
+
+    Returns:
+        dict: A dictionary mapping each selector to its corresponding directory structure text.
+              If no content is found for a selector, it maps to an empty string.
+    """
+    return extract_structures(content, selectors, backend)
+
+
+def stream_directory_structures(response, selectors: list, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                                backend: str = DEFAULT_BACKEND) -> dict:
+    """
+    Extracts directory structures from a streamed response, feeding the body chunk by chunk into an
+    incremental HTML parser. Reading stops, and the connection is released, as soon as the sections
+    of every selector have been closed, so the rest of the page is never downloaded.
+
+    Only plain element ID selectors can be resolved incrementally. If any selector is a more general
+    CSS selector, the whole body is read (still subject to `max_bytes`) and extracted as usual.
+
+    Args:
+        response (requests.Response): A response opened with `stream=True`.
         selectors (list): A list of CSS selectors or element IDs to identify the sections
                           containing the directory structures.
+        max_bytes (int): The maximum number of body bytes to read.
+        backend (str): The extraction backend to use if the selectors cannot be resolved incrementally.
 
     Returns:
         dict: A dictionary mapping each selector to its corresponding directory structure text.
               If no content is found for a selector, it maps to an empty string.
 
     Raises:
-        ConnectionError: If the HTTP request to fetch the webpage fails or returns a non-200 status code.
+        ConnectionError: If the body exceeds `max_bytes` before every selector is resolved.
+    """
+    ids = {selector: selector_to_id(selector) for selector in selectors}
+    collector = SectionTextCollector(ids.values()) if all(ids.values()) else None
+
+    # Without a charset in the Content-Type header, requests assumes ISO-8859-1 for text/html
+    content_type = response.headers.get('Content-Type', '')
+    encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    chunks = []
+    bytes_read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            if bytes_read > max_bytes:
+                raise ConnectionError(f"Response from '{response.url}' exceeded the maximum size of {max_bytes} bytes.")
+
+            if collector is None:
+                chunks.append(chunk)
+                continue
+
+            collector.feed(decoder.decode(chunk))
+            if collector.resolved:
+                break
+    finally:
+        response.close()
+        increment('bytes_downloaded', bytes_read)
+
+    if collector is None:
+        return extract_directory_structures(b''.join(chunks), selectors, backend)
+
+    collector.feed(decoder.decode(b'', final=True))
+    collector.close()
+
+    structures = {}
+    for selector in selectors:
+        structure_text = collector.section_text(ids[selector])
+        if structure_text is None:
+            logging.info(f"No content found for selector: '{selector}'.")
+            structure_text = ""  # Ensuring inclusion in the dictionary even if no content is found
+        structures[selector] = structure_text
+
+    return structures
+
+
+def create_session(max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST) -> requests.Session:
+    """
+    Creates a requests session backed by a keep-alive connection pool. The pool keeps at most
+    `max_connections_per_host` connections per host and blocks further requests to that host until
+    a connection is released, which bounds the per-host concurrency of threads sharing the session.
+
+    Args:
+        max_connections_per_host (int): The maximum number of concurrent connections per host.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max_connections_per_host, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_directory_structures_if_modified(docs_url: str, selectors: list, cache_dir=None, session=None,
+                                           stream: bool = False, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                                           backend: str = DEFAULT_BACKEND):
+    """
+    Fetches directory structures from a webpage, using an on-disk HTTP cache to short-circuit
+    unchanged pages. The validators (ETag, Last-Modified) of the previous response are sent as
+    'If-None-Match' and 'If-Modified-Since' headers; a 304 response means the cached structures
+    are still current and no body is downloaded or parsed.
+
+    Args:
+        docs_url (str): The URL of the webpage from which to fetch directory structures.
+        selectors (list): A list of CSS selectors or element IDs to identify the sections
+                          containing the directory structures.
+        cache_dir (str or Path, optional): The HTTP cache directory. Caching is disabled if None.
+        session (requests.Session, optional): The session to issue the request with, for connection reuse.
+        stream (bool): Whether to stream the response and stop reading once every selector is resolved.
+        max_bytes (int): The maximum number of body bytes to read in streaming mode.
+        backend (str): The extraction backend to use. See `extract.extract_structures`.
+
+    Returns:
+        dict or None: A dictionary mapping each selector to its directory structure text, or None
+                      if the page is unchanged since the cached fetch of the same selectors.
+
+    Raises:
+        ConnectionError: If the HTTP request to fetch the webpage fails or returns an error status code.
         ValueError: If the provided selectors list is empty.
     """
     # Validate input
     if not selectors:
         raise ValueError("Selectors list cannot be empty.")
 
+    key = cache_key(docs_url, selectors)
+    entry = load_cache_entry(cache_dir, key) if cache_dir else None
+
     try:
-        response = requests.get(docs_url)
+        with timed('fetch'):
+            response = (session or requests).get(docs_url, headers=conditional_headers(entry), stream=stream)
         response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx, 5xx)
     except requests.exceptions.RequestException as e:
         raise ConnectionError(f"Failed to fetch the webpage: {e}")
 
-    # Parse the HTML content of the webpage
-    soup = BeautifulSoup(response.content, 'html.parser')
-    structures = {}
+    if response.status_code == 304 and entry:
+        response.close()
+        increment('pages_not_modified')
+        logging.info(f"Webpage not modified since last fetch: '{docs_url}'.")
+        return None
 
-    for selector in selectors:
-        # Handle both CSS selectors and element IDs with a unified approach
-        section = soup.select_one(f'#{selector}' if str(selector[0]).isalnum() else selector)
-        if section:
-            # Assuming directory structures are within <pre> tags
-            structure_text = '\n'.join(pre.get_text() for pre in section.find_all('pre'))
-            structures[selector] = structure_text.strip()
-        else:
-            logging.info(f"No content found for selector: '{selector}'.")
-            structures[selector] = ""  # Ensuring inclusion in the dictionary even if no content is found
+    if stream:
+        # The body is downloaded while it is parsed, so both are timed together
+        with timed('fetch.stream_extract'):
+            structures = stream_directory_structures(response, selectors, max_bytes, backend)
+    else:
+        increment('bytes_downloaded', len(response.content))
+        with timed('extract'):
+            structures = extract_directory_structures(response.content, selectors, backend)
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if cache_dir and (etag or last_modified):
+        store_cache_entry(cache_dir, key, etag, last_modified, structures)
+
+    return structures
+
+
+def fetch_directory_structures(docs_url: str, selectors: list, cache_dir=None, session=None,
+                               stream: bool = False, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                               backend: str = DEFAULT_BACKEND) -> dict:
+    """
+    Fetches directory structures from a webpage, handling both CSS selectors and element IDs.
+    This function requests the webpage content, parses it, and then searches for specified
+    selectors to extract directory structures, typically contained within <pre> tags.
+
+    Args:
+        docs_url (str): The URL of the webpage from which to fetch directory structures.
+        selectors (list): A list of CSS selectors or element IDs to identify the sections
+                          containing the directory structures.
+        cache_dir (str or Path, optional): The HTTP cache directory. When the page is unchanged,
+                                           the cached structures are returned.
+        session (requests.Session, optional): The session to issue the request with, for connection reuse.
+        stream (bool): Whether to stream the response and stop reading once every selector is resolved.
+        max_bytes (int): The maximum number of body bytes to read in streaming mode.
+        backend (str): The extraction backend to use. See `extract.extract_structures`.
+
+    Returns:
+        dict: A dictionary mapping each selector to its corresponding directory structure text.
+              If no content is found for a selector, it maps to an empty string.
 
+    Raises:
+        ConnectionError: If the HTTP request to fetch the webpage fails or returns a non-200 status code.
+        ValueError: If the provided selectors list is empty.
+    """
+    structures = fetch_directory_structures_if_modified(docs_url, selectors, cache_dir, session, stream, max_bytes,
+                                                        backend)
+    if structures is None:
+        structures = load_cache_entry(cache_dir, cache_key(docs_url, selectors))['structures']
     return structures
 
 
+def load_cached_structures(cache_dir, source: dict) -> dict:
+    """
+    Loads the cached directory structures of a documentation source.
+
+    Args:
+        cache_dir (str or Path): The HTTP cache directory.
+        source (dict): A dictionary with 'docs_url' and 'selectors' keys.
+
+    Returns:
+        dict: A dictionary mapping each selector to its cached directory structure text.
+    """
+    return load_cache_entry(cache_dir, cache_key(source['docs_url'], source['selectors']))['structures']
+
+
+def load_all_cached_structures(cache_dir, sources: dict) -> dict:
+    """
+    Loads the cached directory structures of several documentation sources.
+
+    Args:
+        cache_dir (str or Path): The HTTP cache directory.
+        sources (dict): A dictionary mapping each source name to a dictionary with 'docs_url' and
+                        'selectors' keys, as returned by `validate_and_get_sources`.
+
+    Returns:
+        dict: A dictionary mapping each (source, selector) tuple to its cached directory structure text,
+              in configuration order.
+    """
+    results = {}
+    for source_name, source in sources.items():
+        for selector, structure_text in load_cached_structures(cache_dir, source).items():
+            results[(source_name, selector)] = structure_text
+    return results
+
+
+def fetch_all_directory_structures_if_modified(sources: dict, cache_dir=None,
+                                               max_workers: int = DEFAULT_MAX_WORKERS,
+                                               max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                                               stream: bool = False, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                                               backend: str = DEFAULT_BACKEND):
+    """
+    Fetches directory structures from several documentation sources concurrently. Sources are fetched
+    by a bounded thread pool over a shared keep-alive session, so the total wall time approaches that
+    of the slowest single fetch. Unchanged sources are served from the HTTP cache.
+
+    Args:
+        sources (dict): A dictionary mapping each source name to a dictionary with 'docs_url' and
+                        'selectors' keys, as returned by `validate_and_get_sources`.
+        cache_dir (str or Path, optional): The HTTP cache directory. Caching is disabled if None.
+        max_workers (int): The maximum number of sources fetched at the same time.
+        max_connections_per_host (int): The maximum number of concurrent connections per host.
+        stream (bool): Whether to stream responses and stop reading once every selector is resolved.
+        max_bytes (int): The maximum number of body bytes to read per response in streaming mode.
+        backend (str): The extraction backend to use. See `extract.extract_structures`.
+
+    Returns:
+        dict or None: A dictionary mapping each (source, selector) tuple to its directory structure text,
+                      in configuration order, or None if no source changed since the cached fetch.
+
+    Raises:
+        ConnectionError: If fetching any of the sources fails.
+        ValueError: If a source has an empty selectors list.
+    """
+    with create_session(max_connections_per_host) as session, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as executor:
+        futures = {
+            source_name: executor.submit(fetch_directory_structures_if_modified,
+                                         source['docs_url'], source['selectors'], cache_dir, session,
+                                         stream, max_bytes, backend)
+            for source_name, source in sources.items()
+        }
+
+        results = {}
+        modified = False
+        for source_name, future in futures.items():
+            structures = future.result()
+            if structures is None:
+                structures = load_cached_structures(cache_dir, sources[source_name])
+            else:
+                modified = True
+
+            for selector, structure_text in structures.items():
+                results[(source_name, selector)] = structure_text
+
+    return results if modified else None
+
+
+def fetch_all_directory_structures(sources: dict, cache_dir=None,
+                                   max_workers: int = DEFAULT_MAX_WORKERS,
+                                   max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                                   stream: bool = False, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                                   backend: str = DEFAULT_BACKEND) -> dict:
+    """
+    Fetches directory structures from several documentation sources concurrently.
+
+    Args:
+        sources (dict): A dictionary mapping each source name to a dictionary with 'docs_url' and
+                        'selectors' keys, as returned by `validate_and_get_sources`.
+        cache_dir (str or Path, optional): The HTTP cache directory. When a page is unchanged,
+                                           its cached structures are returned.
+        max_workers (int): The maximum number of sources fetched at the same time.
+        max_connections_per_host (int): The maximum number of concurrent connections per host.
+        stream (bool): Whether to stream responses and stop reading once every selector is resolved.
+        max_bytes (int): The maximum number of body bytes to read per response in streaming mode.
+        backend (str): The extraction backend to use. See `extract.extract_structures`.
+
+    Returns:
+        dict: A dictionary mapping each (source, selector) tuple to its directory structure text.
+
+    Raises:
+        ConnectionError: If fetching any of the sources fails.
+        ValueError: If a source has an empty selectors list.
+    """
+    results = fetch_all_directory_structures_if_modified(sources, cache_dir, max_workers, max_connections_per_host,
+                                                         stream, max_bytes, backend)
+    if results is None:
+        results = load_all_cached_structures(cache_dir, sources)
+    return results
+
+
+def structures_by_layout(results: dict) -> dict:
+    """
+    Names the structures fetched from one or more sources by layout. With a single source the layout
+    name is the selector; with several sources it is prefixed by the source name ('<source>/<selector>')
+    so that layouts from different documentation versions do not collide.
+
+    Args:
+        results (dict): A dictionary mapping (source, selector) tuples to directory structure text.
+
+    Returns:
+        dict: A dictionary with layout names as keys and directory structure text as values.
+    """
+    source_names = {source_name for source_name, _ in results}
+    if len(source_names) <= 1:
+        return {selector: structure_text for (_, selector), structure_text in results.items()}
+
+    return {f"{source_name}/{selector}": structure_text for (source_name, selector), structure_text in results.items()}
+
+
 def main():
-    # Load configuration
-    config = load_config(CONFIG_PATH)
-
-    # Fetch directory structures based on the provided URL and selectors
-    docs_url = validate_and_get_docs_url(config)
-    selectors = validate_and_get_selectors(config)
-    structures = fetch_directory_structures(docs_url, selectors)
-
-    # Display retrieved structures
-    for selector, structure in structures.items():
-        if structure:
-            logging.info(f"\nStructure for {selector}:\n{structure}\n")
-        else:
-            logging.info(f"No structure found for {selector}.")
+    from cli import main as cli_main
+
+    # Fetch and log the configured layouts
+    cli_main(['fetch', *sys.argv[1:]])
 
 
 if __name__ == "__main__":
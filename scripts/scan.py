@@ -0,0 +1,259 @@
+from extract import BACKENDS, DEFAULT_BACKEND, extract_structures
+from fileio import write_text_if_changed
+from manifest import content_hash
+from metrics import increment, timed
+from parse import looks_like_directory_structure, normalize_layout_name
+from stream_extract import find_pre_section_ids
+
+from functools import partial
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+
+SCAN_INDEX_VERSION = 1
+SCAN_INDEX_NAME = 'scan-index.json'
+HTML_SUFFIXES = ('.html', '.htm')
+DEFAULT_MIN_ENTRIES = 3
+
+
+def iter_html_files(root):
+    """
+    Walks a directory tree with `os.scandir` and yields its HTML files. Hidden directories are skipped.
+
+    Args:
+        root (str or Path): The root of the documentation snapshot.
+
+    Yields:
+        tuple: The path relative to `root` ('/'-separated, str), the modification time in nanoseconds
+               (int) and the size in bytes (int) of each HTML file.
+    """
+    pending = [(str(root), '')]
+    while pending:
+        dir_path, parent = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, f"{parent}{entry.name}/"))
+                elif entry.name.lower().endswith(HTML_SUFFIXES) and entry.is_file():
+                    stat = entry.stat()
+                    yield f"{parent}{entry.name}", stat.st_mtime_ns, stat.st_size
+
+
+def scan_file(path, backend: str = DEFAULT_BACKEND, min_entries: int = DEFAULT_MIN_ENTRIES) -> list:
+    """
+    Finds the directory layouts in an HTML file. Every section holding a <pre> element is extracted
+    with `extract.extract_structures`, exactly as `fetch_directory_structures` would extract it if
+    its ID were configured as a selector, and kept if its text looks like a directory structure.
+
+    Args:
+        path (str or Path): The HTML file.
+        backend (str): The extraction backend to use.
+        min_entries (int): The minimum number of entries of a layout.
+
+    Returns:
+        list or None: A dictionary with 'id', 'hash' and 'text' keys for each layout found, in document
+                      order, or None if the file cannot be read or decoded.
+    """
+    try:
+        content = Path(path).read_bytes()
+        section_ids = find_pre_section_ids(content)
+        if not section_ids:
+            return []
+        structures = extract_structures(content, section_ids, backend)
+    except (OSError, UnicodeDecodeError) as e:
+        logging.warning(f"Skipping unreadable file {path}: {e}")
+        return None
+
+    layouts = []
+    for section_id, text in structures.items():
+        if looks_like_directory_structure(text, min_entries):
+            layouts.append({'id': section_id, 'hash': content_hash(text), 'text': text})
+    return layouts
+
+
+def load_scan_index(index_path, root) -> dict:
+    """
+    Loads the scan index of a documentation snapshot.
+
+    Args:
+        index_path (str or Path or None): The path of the index file. None disables the index.
+        root (str or Path): The root of the documentation snapshot the index must belong to.
+
+    Returns:
+        dict: The indexed files, keyed by relative path, each with 'mtime_ns', 'size' and 'layouts'
+              keys. Empty if the index is missing, unreadable, outdated or belongs to another root.
+    """
+    if index_path is None:
+        return {}
+
+    try:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if (not isinstance(index, dict) or index.get('version') != SCAN_INDEX_VERSION
+            or index.get('root') != str(Path(root).resolve()) or not isinstance(index.get('files'), dict)):
+        return {}
+    return index['files']
+
+
+def save_scan_index(index_path, root, files: dict):
+    """
+    Saves the scan index of a documentation snapshot atomically, unless it is unchanged.
+
+    Args:
+        index_path (str or Path): The path of the index file.
+        root (str or Path): The root of the documentation snapshot.
+        files (dict): The indexed files, as returned by `load_scan_index`.
+    """
+    index = {'version': SCAN_INDEX_VERSION, 'root': str(Path(root).resolve()), 'files': files}
+    Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+    write_text_if_changed(index_path, json.dumps(index, indent=1, sort_keys=True, ensure_ascii=False) + '\n')
+
+
+def scan_corpus(root, index_path=None, jobs=None, backend: str = DEFAULT_BACKEND,
+                min_entries: int = DEFAULT_MIN_ENTRIES) -> dict:
+    """
+    Scans a local documentation snapshot for directory layouts. Files are extracted in parallel by
+    a process pool. With an index, files whose modification time and size are unchanged since the
+    previous scan are not read again, and the index is updated for the next scan.
+
+    Args:
+        root (str or Path): The root of the documentation snapshot.
+        index_path (str or Path, optional): The path of the scan index. Every file is read if None.
+        jobs (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        backend (str): The extraction backend to use.
+        min_entries (int): The minimum number of entries of a layout.
+
+    Returns:
+        dict: The scanned files, keyed by relative path, each with 'mtime_ns', 'size' and 'layouts'
+              keys; every layout is a dictionary with 'id', 'hash' and 'text' keys.
+    """
+    root = Path(root)
+    previous = load_scan_index(index_path, root)
+
+    files = {}
+    stale = []
+    with timed('scan.walk'):
+        for relative_path, mtime_ns, size in iter_html_files(root):
+            entry = previous.get(relative_path)
+            if entry and entry.get('mtime_ns') == mtime_ns and entry.get('size') == size:
+                files[relative_path] = entry
+            else:
+                files[relative_path] = {'mtime_ns': mtime_ns, 'size': size, 'layouts': []}
+                stale.append(relative_path)
+    increment('scan_files_reused', len(files) - len(stale))
+    increment('scan_files_read', len(stale))
+
+    worker = partial(scan_file, backend=backend, min_entries=min_entries)
+    paths = [root / relative_path for relative_path in stale]
+    with timed('scan.extract'):
+        if len(paths) > 1 and jobs != 1:
+            from concurrent.futures import ProcessPoolExecutor  # Costly to import, and rarely needed
+
+            workers = jobs or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Batch files per task, so that small files do not pay a round trip each
+                chunk_size = max(1, min(64, len(paths) // (4 * workers)))
+                results = list(executor.map(worker, paths, chunksize=chunk_size))
+        else:
+            results = [worker(path) for path in paths]
+
+    for relative_path, layouts in zip(stale, results):
+        if layouts is None:
+            # Unreadable files have no layouts, and are read again by the next scan
+            files[relative_path]['mtime_ns'] = None
+            increment('scan_files_failed')
+        else:
+            files[relative_path]['layouts'] = layouts
+
+    if index_path is not None:
+        save_scan_index(index_path, root, files)
+
+    return files
+
+
+def add_scan_arguments(parser):
+    """
+    Adds the command-line arguments of the scan command to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument('docs_dir',
+                        type=Path,
+                        help='The root directory of the documentation snapshot.')
+    parser.add_argument('--index',
+                        type=Path,
+                        help=f"Scan index file (default: '{SCAN_INDEX_NAME}' in the configured CACHE_DIR).")
+    parser.add_argument('--no-index',
+                        action='store_true',
+                        help='Read every file, without loading or saving the scan index.')
+    parser.add_argument('--jobs',
+                        type=int,
+                        help='Number of worker processes (default: number of CPUs).')
+    parser.add_argument('--backend',
+                        choices=['auto', *BACKENDS],
+                        default=DEFAULT_BACKEND,
+                        help='HTML extraction backend to use (default: %(default)s).')
+    parser.add_argument('--min-entries',
+                        type=int,
+                        default=DEFAULT_MIN_ENTRIES,
+                        help='Minimum number of entries of a layout (default: %(default)s).')
+    parser.add_argument('--output-dir',
+                        type=Path,
+                        help="Save each layout as '<file>/<section id>.txt' in this directory.")
+
+
+def execute_scan(args):
+    """
+    Scans a documentation snapshot as selected by the command-line arguments and logs the layouts found.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_scan_arguments`.
+    """
+    from config import CONFIG_PATH, get_cache_dir, load_config
+
+    index_path = None
+    if args.index is not None:
+        index_path = args.index
+    elif not args.no_index:
+        cache_dir = get_cache_dir(load_config(CONFIG_PATH))
+        index_path = cache_dir / SCAN_INDEX_NAME if cache_dir else None
+
+    files = scan_corpus(args.docs_dir, None if args.no_index else index_path, args.jobs, args.backend,
+                        args.min_entries)
+
+    found = 0
+    for relative_path, entry in sorted(files.items()):
+        for layout in entry['layouts']:
+            found += 1
+            logging.info(f"{relative_path}#{layout['id']}  {layout['hash'][:12]}  "
+                         f"{len(layout['text'].splitlines())} lines")
+            if args.output_dir:
+                layout_path = (args.output_dir / Path(relative_path).with_suffix('')
+                               / f"{normalize_layout_name(layout['id'])}.txt")
+                layout_path.parent.mkdir(parents=True, exist_ok=True)
+                layout_path.write_text(f"{layout['text']}\n", encoding='utf-8')
+
+    logging.info(f"Found {found} layouts in {len(files)} HTML files.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Scans a local snapshot of the documentation for directory layouts.')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    execute_scan(args)
+
+
+if __name__ == "__main__":
+    main()
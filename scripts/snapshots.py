@@ -0,0 +1,422 @@
+from fileio import atomic_write
+from manifest import canonical_json, content_hash
+from metrics import increment, timed
+from parse import StructureNode
+from parse_cache import parse_structure_cached
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import zlib
+
+SNAPSHOT_STORE_NAME = 'snapshots'
+SNAPSHOT_INDEX_NAME = 'index.jsonl'
+SNAPSHOT_OBJECTS_NAME = 'objects'
+
+Snapshot = namedtuple('Snapshot', ['timestamp', 'source', 'selector', 'docs_url', 'text_hash', 'tree_hash'])
+"""
+One index record: the structure text fetched for a selector of a documentation source, first seen at
+`timestamp`, as the hashes of its text and of its parsed tree in the object store.
+"""
+
+_HASH_PREFIX = re.compile(r'[0-9a-f]{6,64}')
+
+
+def _now() -> str:
+    """Formats the current time as the ISO 8601 UTC timestamp used by index records."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def normalize_timestamp(value: str) -> str:
+    """
+    Normalizes a date or time given on the command line to an index timestamp. A bare date stands
+    for the end of that day, so that the snapshots recorded during the day are included.
+
+    Args:
+        value (str): An ISO 8601 date ('2026-10-16') or date and time ('2026-10-16T12:00', with an
+                     optional UTC offset; UTC if omitted).
+
+    Returns:
+        str: The UTC timestamp, comparable as a string with index timestamps.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 date or time.
+    """
+    moment = datetime.fromisoformat(value)
+    if len(value) == 10:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _object_path(store_dir, object_hash: str) -> Path:
+    """Computes the path of an object, fanned out by the first two hex digits of its hash."""
+    return Path(store_dir) / SNAPSHOT_OBJECTS_NAME / object_hash[:2] / object_hash[2:]
+
+
+def store_object(store_dir, object_hash: str, content: str) -> bool:
+    """
+    Stores a text in the object store under its hash, zlib-compressed, unless it is already there.
+
+    Args:
+        store_dir (str or Path): The snapshot store.
+        object_hash (str): The `content_hash` of the text.
+        content (str): The text.
+
+    Returns:
+        bool: True if the object was written, False if the store already held it.
+    """
+    path = _object_path(store_dir, object_hash)
+    if path.exists():
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, zlib.compress(content.encode('utf-8'), 9))
+    return True
+
+
+def load_object(store_dir, object_hash: str) -> str:
+    """
+    Loads a text from the object store.
+
+    Args:
+        store_dir (str or Path): The snapshot store.
+        object_hash (str): The hash of the text.
+
+    Returns:
+        str: The text.
+
+    Raises:
+        FileNotFoundError: If the store does not hold the object.
+    """
+    return zlib.decompress(_object_path(store_dir, object_hash).read_bytes()).decode('utf-8')
+
+
+def load_snapshot_index(store_dir) -> list:
+    """
+    Loads the index of a snapshot store. Malformed lines, such as one left half-written by an
+    interrupted run, are skipped.
+
+    Args:
+        store_dir (str or Path): The snapshot store.
+
+    Returns:
+        list: The Snapshot records, in the order they were recorded.
+    """
+    try:
+        with open(Path(store_dir) / SNAPSHOT_INDEX_NAME, 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+    except OSError:
+        return []
+
+    snapshots = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, list) and len(record) == len(Snapshot._fields):
+            snapshots.append(Snapshot(*record))
+    return snapshots
+
+
+def latest_snapshots(snapshots, at=None) -> dict:
+    """
+    Finds the snapshot of every (source, selector) that was current at a given time.
+
+    Args:
+        snapshots (list): The Snapshot records, in the order they were recorded.
+        at (str, optional): A UTC timestamp, as returned by `normalize_timestamp`. Defaults to now.
+
+    Returns:
+        dict: The current Snapshot of each (source, selector) tuple recorded by then.
+    """
+    latest = {}
+    for snapshot in snapshots:
+        if at is None or snapshot.timestamp <= at:
+            latest[(snapshot.source, snapshot.selector)] = snapshot
+    return latest
+
+
+def record_snapshots(store_dir, sources: dict, results: dict, timestamp=None) -> list:
+    """
+    Records fetched structures in the snapshot store. Each structure text and its parsed tree are
+    stored once, however many times and from however many sources they are fetched, and the index
+    only gains a record when a (source, selector) changes, so the store grows with distinct content.
+    Selectors without a structure are not recorded.
+
+    Args:
+        store_dir (str or Path): The snapshot store.
+        sources (dict): The documentation sources, as returned by `config.validate_and_get_sources`.
+        results (dict): A dictionary mapping (source, selector) tuples to directory structure text.
+        timestamp (str, optional): The time of the fetch. Defaults to now.
+
+    Returns:
+        list: The new Snapshot records.
+    """
+    store_dir = Path(store_dir)
+    timestamp = timestamp or _now()
+    latest = latest_snapshots(load_snapshot_index(store_dir))
+
+    recorded = []
+    with timed('snapshots.record'):
+        for (source_name, selector), structure_text in results.items():
+            if not structure_text:
+                continue
+
+            text_hash = content_hash(structure_text)
+            docs_url = sources[source_name]['docs_url']
+            previous = latest.get((source_name, selector))
+            if previous is not None and previous.text_hash == text_hash and previous.docs_url == docs_url:
+                continue
+
+            tree_text = canonical_json(parse_structure_cached(structure_text, text_hash))
+            tree_hash = content_hash(tree_text)
+            written = store_object(store_dir, text_hash, structure_text) + store_object(store_dir, tree_hash, tree_text)
+            increment('snapshot_objects_stored', written)
+            recorded.append(Snapshot(timestamp, source_name, selector, docs_url, text_hash, tree_hash))
+
+        if recorded:
+            store_dir.mkdir(parents=True, exist_ok=True)
+            with open(store_dir / SNAPSHOT_INDEX_NAME, 'a', encoding='utf-8') as file:
+                file.write(''.join(json.dumps(list(snapshot), ensure_ascii=False, separators=(',', ':')) + '\n'
+                                   for snapshot in recorded))
+
+    increment('snapshots_recorded', len(recorded))
+    return recorded
+
+
+def resolve_snapshot(snapshots, ref: str) -> Snapshot:
+    """
+    Finds the snapshot a reference points to. A reference is either a prefix of at least six hex digits
+    of a structure text hash, or a layout name ('<selector>' or '<source>/<selector>') optionally
+    followed by '@<date or time>', which selects the layout as it was at that time rather than now.
+
+    Args:
+        snapshots (list): The Snapshot records, in the order they were recorded.
+        ref (str): The reference.
+
+    Returns:
+        Snapshot: The latest matching snapshot.
+
+    Raises:
+        ValueError: If the reference matches no snapshot, or several layouts.
+    """
+    if _HASH_PREFIX.fullmatch(ref):
+        matches = [snapshot for snapshot in snapshots if snapshot.text_hash.startswith(ref)]
+        if matches:
+            if len({snapshot.text_hash for snapshot in matches}) > 1:
+                raise ValueError(f"The hash prefix '{ref}' is ambiguous.")
+            return matches[-1]
+
+    layout, _, at = ref.partition('@')
+    source_name, _, selector = layout.rpartition('/')
+    latest = latest_snapshots(snapshots, normalize_timestamp(at) if at else None)
+    matches = [snapshot for (snapshot_source, snapshot_selector), snapshot in latest.items()
+               if snapshot_selector == selector and source_name in ('', snapshot_source)]
+    if not matches:
+        raise ValueError(f"No snapshot matches '{ref}'.")
+    if len(matches) > 1:
+        sources = ', '.join(snapshot.source for snapshot in matches)
+        raise ValueError(f"'{ref}' matches the layout of several sources ({sources}); prefix it with one.")
+    return matches[0]
+
+
+def structure_from_data(data) -> list:
+    """
+    Rebuilds a parsed structure of StructureNodes from its JSON form, as stored in the object store.
+
+    Args:
+        data (list): The structure as a list of dictionaries.
+
+    Returns:
+        list: The structure as a list of StructureNodes.
+    """
+    structure = []
+    pending = [(data, structure)]
+    while pending:
+        items, nodes = pending.pop()
+        for item in items:
+            children = None if item.get('children') is None else []
+            nodes.append(StructureNode(item['type'], item['path'], item.get('comment', ''), children))
+            if children is not None:
+                pending.append((item['children'], children))
+    return structure
+
+
+def load_snapshot_structure(store_dir, snapshot: Snapshot) -> list:
+    """
+    Loads the parsed tree of a snapshot, as parsed when it was recorded.
+
+    Args:
+        store_dir (str or Path): The snapshot store.
+        snapshot (Snapshot): The snapshot.
+
+    Returns:
+        list: The parsed directory structure.
+    """
+    return structure_from_data(json.loads(load_object(store_dir, snapshot.tree_hash)))
+
+
+def store_size(store_dir) -> tuple:
+    """Counts the objects of a snapshot store and their total size in bytes."""
+    count = size = 0
+    for dir_path, _, file_names in os.walk(Path(store_dir) / SNAPSHOT_OBJECTS_NAME):
+        for file_name in file_names:
+            count += 1
+            size += os.path.getsize(os.path.join(dir_path, file_name))
+    return count, size
+
+
+def _layout_label(snapshot: Snapshot) -> str:
+    """Names the layout of a snapshot like `update.py` does when several sources are configured."""
+    return f"{snapshot.source}/{snapshot.selector}"
+
+
+def command_record(args, store_dir):
+    """Fetches the configured layouts and records the changed ones."""
+    from config import CONFIG_PATH, get_cache_dir, load_config, validate_and_get_sources
+    from retrieve import fetch_all_directory_structures
+
+    config = load_config(CONFIG_PATH)
+    sources = validate_and_get_sources(config)
+    results = fetch_all_directory_structures(sources, None if args.no_cache else get_cache_dir(config))
+    recorded = record_snapshots(store_dir, sources, results)
+    for snapshot in recorded:
+        logging.info(f"Recorded {_layout_label(snapshot)}  {snapshot.text_hash[:12]}")
+    logging.info(f"Recorded {len(recorded)} of {len(results)} layouts; the others are unchanged.")
+
+
+def command_list(args, store_dir):
+    """Logs the recorded snapshots, or the ones current at a given time."""
+    snapshots = load_snapshot_index(store_dir)
+    if args.at:
+        snapshots = list(latest_snapshots(snapshots, normalize_timestamp(args.at)).values())
+    if args.layout:
+        source_name, _, selector = args.layout.rpartition('/')
+        snapshots = [snapshot for snapshot in snapshots
+                     if snapshot.selector == selector and source_name in ('', snapshot.source)]
+
+    for snapshot in snapshots:
+        logging.info(f"{snapshot.timestamp}  {snapshot.text_hash[:12]}  {_layout_label(snapshot)}  {snapshot.docs_url}")
+
+    count, size = store_size(store_dir)
+    logging.info(f"{len(snapshots)} snapshots; the store holds {count} objects ({size} bytes).")
+
+
+def command_show(args, store_dir):
+    """Writes the structure text, or the parsed tree as JSON, of a snapshot to stdout."""
+    snapshot = resolve_snapshot(load_snapshot_index(store_dir), args.ref)
+    if args.tree:
+        sys.stdout.write(json.dumps(json.loads(load_object(store_dir, snapshot.tree_hash)), indent=2,
+                                    ensure_ascii=False) + '\n')
+    else:
+        sys.stdout.write(load_object(store_dir, snapshot.text_hash) + '\n')
+
+
+def command_diff(args, store_dir):
+    """Logs the structural changes between two snapshots."""
+    from tree_diff import change_to_dict, diff_structures, format_change_report
+
+    snapshots = load_snapshot_index(store_dir)
+    old, new = resolve_snapshot(snapshots, args.old_ref), resolve_snapshot(snapshots, args.new_ref)
+    changes = diff_structures(load_snapshot_structure(store_dir, old), load_snapshot_structure(store_dir, new))
+    logging.info(f"{_layout_label(old)}@{old.timestamp} → {_layout_label(new)}@{new.timestamp}")
+    logging.info(format_change_report({_layout_label(new): [change_to_dict(change) for change in changes]}))
+
+
+def add_snapshot_arguments(parser):
+    """
+    Adds the subcommands and command-line arguments of the snapshots command to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument('--store',
+                        type=Path,
+                        help=f"Snapshot store (default: '{SNAPSHOT_STORE_NAME}' in the configured CACHE_DIR).")
+    actions = parser.add_subparsers(dest='action', required=True)
+
+    record_parser = actions.add_parser('record', help='Fetch the configured layouts and record the changed ones.')
+    record_parser.add_argument('--no-cache',
+                               action='store_true',
+                               help='Bypass the HTTP cache.')
+    record_parser.set_defaults(action_handler=command_record)
+
+    list_parser = actions.add_parser('list', help='List the recorded snapshots.')
+    list_parser.add_argument('--layout',
+                             help="Only list the snapshots of this layout ('<selector>' or '<source>/<selector>').")
+    list_parser.add_argument('--at',
+                             help='Only list the snapshot of each layout that was current at this ISO date or time.')
+    list_parser.set_defaults(action_handler=command_list)
+
+    show_parser = actions.add_parser('show', help='Show the structure text of a snapshot.')
+    show_parser.add_argument('ref',
+                             help="A hash prefix, or a layout name optionally followed by '@<date or time>'.")
+    show_parser.add_argument('--tree',
+                             action='store_true',
+                             help='Show the parsed tree as JSON instead of the structure text.')
+    show_parser.set_defaults(action_handler=command_show)
+
+    diff_parser = actions.add_parser('diff', help='Show the structural changes between two snapshots.')
+    diff_parser.add_argument('old_ref',
+                             help='The old snapshot, as accepted by show.')
+    diff_parser.add_argument('new_ref',
+                             help='The new snapshot, as accepted by show.')
+    diff_parser.set_defaults(action_handler=command_diff)
+
+
+def get_snapshot_store(config):
+    """
+    Retrieves the default snapshot store from the configuration object.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration object.
+
+    Returns:
+        Path or None: The store, in the cache directory, or None if caching is disabled.
+    """
+    from config import get_cache_dir
+
+    cache_dir = get_cache_dir(config)
+    return cache_dir / SNAPSHOT_STORE_NAME if cache_dir else None
+
+
+def execute_snapshots(args):
+    """
+    Runs the snapshots subcommand selected by the command-line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_snapshot_arguments`.
+
+    Raises:
+        ValueError: If no store is given and caching is disabled.
+    """
+    from config import CONFIG_PATH, load_config
+
+    store_dir = args.store or get_snapshot_store(load_config(CONFIG_PATH))
+    if store_dir is None:
+        raise ValueError("No snapshot store: set CACHE_DIR in the configuration or pass --store.")
+    args.action_handler(args, store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Records the fetched layouts in a content-addressed store, and lists, shows and diffs them.')
+    add_snapshot_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    execute_snapshots(args)
+
+
+if __name__ == "__main__":
+    main()
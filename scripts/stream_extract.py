@@ -0,0 +1,162 @@
+from html.parser import HTMLParser
+import re
+
+# Elements that never have a closing tag and therefore never enter the element stack
+VOID_ELEMENTS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+})
+
+ID_SELECTOR_PATTERN = re.compile(r'#?([A-Za-z0-9][\w\-]*)')
+
+
+def selector_to_id(selector: str):
+    """
+    Resolves a selector to the element ID it targets, if it is a plain ID. Bare names are treated
+    as IDs, the same way `fetch_directory_structures` treats selectors starting with an alphanumeric.
+
+    Args:
+        selector (str): A CSS selector or element ID.
+
+    Returns:
+        str or None: The targeted element ID, or None if the selector is not a plain ID selector.
+    """
+    if not str(selector[0]).isalnum() and not selector.startswith('#'):
+        return None
+
+    match = ID_SELECTOR_PATTERN.fullmatch(selector)
+    return match.group(1) if match else None
+
+
+class SectionTextCollector(HTMLParser):
+    """
+    An incremental HTML parser that collects the text of <pre> elements inside the sections
+    identified by a set of element IDs. Content can be fed chunk by chunk as it arrives, and
+    `resolved` reports once every section has been closed so that the caller can stop reading.
+
+    Unclosed elements are handled the way BeautifulSoup's 'html.parser' builder handles them: an
+    end tag closes every element opened after the matching start tag.
+    """
+
+    def __init__(self, ids):
+        super().__init__(convert_charrefs=True)
+        self.pending_ids = set(ids)
+        self.sections = {}  # Collected <pre> texts of each section, keyed by element ID
+        self.open_elements = []  # Stack of (tag, element ID if it is a target section)
+        self.active_ids = []  # Target sections currently open
+        self.pre_depth = 0
+
+    @property
+    def resolved(self) -> bool:
+        """Whether every target section has been closed."""
+        return not self.pending_ids and not self.active_ids
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            self.handle_startendtag(tag, attrs)
+            return
+
+        element_id = dict(attrs).get('id')
+        if element_id in self.pending_ids:
+            self.pending_ids.discard(element_id)
+            self.sections[element_id] = []
+            self.active_ids.append(element_id)
+        else:
+            element_id = None
+        self.open_elements.append((tag, element_id))
+
+        if tag == 'pre':
+            if self.pre_depth == 0:
+                for active_id in self.active_ids:
+                    self.sections[active_id].append([])
+            self.pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags never contain text, but can still open a (empty) target section
+        element_id = dict(attrs).get('id')
+        if element_id in self.pending_ids:
+            self.pending_ids.discard(element_id)
+            self.sections[element_id] = []
+
+    def handle_endtag(self, tag):
+        # Close the most recently opened matching element, along with any unclosed elements inside it
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[index][0] == tag:
+                break
+        else:
+            return  # Stray end tag
+
+        while len(self.open_elements) > index:
+            closed_tag, element_id = self.open_elements.pop()
+            if closed_tag == 'pre':
+                self.pre_depth -= 1
+            if element_id is not None:
+                self.active_ids.remove(element_id)
+
+    def handle_data(self, data):
+        if self.pre_depth:
+            for active_id in self.active_ids:
+                if self.sections[active_id]:
+                    self.sections[active_id][-1].append(data)
+
+    def section_text(self, element_id: str):
+        """
+        Returns the text of the <pre> elements collected for a section.
+
+        Args:
+            element_id (str): The ID of the section.
+
+        Returns:
+            str or None: The <pre> texts joined by newlines and stripped, or None if the section was not found.
+        """
+        if element_id not in self.sections:
+            return None
+        return '\n'.join(''.join(pre) for pre in self.sections[element_id]).strip()
+
+
+class PreSectionFinder(HTMLParser):
+    """
+    An HTML parser that finds the sections holding <pre> elements: for every <pre>, the ID of the
+    nearest element with an ID that encloses it. Unclosed elements are handled like `SectionTextCollector`.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.section_ids = {}  # IDs of the sections holding a <pre>, in document order
+        self.open_elements = []  # Stack of (tag, element ID or None)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+
+        if tag == 'pre':
+            for _, open_id in reversed(self.open_elements):
+                if open_id is not None:
+                    self.section_ids.setdefault(open_id, None)
+                    break
+        self.open_elements.append((tag, dict(attrs).get('id')))
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[index][0] == tag:
+                del self.open_elements[index:]
+                return
+
+
+def find_pre_section_ids(content) -> list:
+    """
+    Lists the IDs of the sections holding <pre> elements in an HTML document.
+
+    Args:
+        content (bytes or str): The HTML content.
+
+    Returns:
+        list: The section IDs, in document order and without duplicates.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+
+    finder = PreSectionFinder()
+    finder.feed(content)
+    finder.close()
+    return list(finder.section_ids)
@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import html
+import random
+import threading
+
+DIRECTORY_NAMES = ('roles', 'tasks', 'handlers', 'templates', 'files', 'vars', 'defaults', 'meta', 'library',
+                   'group_vars', 'host_vars', 'inventories', 'module_utils', 'filter_plugins', 'tests')
+FILE_NAMES = ('main.yml', 'site.yml', 'hosts', 'ntp.conf.j2', 'bar.txt', 'foo.sh', 'webservers.yml',
+              'dbservers.yml', 'production', 'staging', 'requirements.yml', 'README.md')
+COMMENT_WORDS = ('the', 'tasks', 'file', 'can', 'include', 'smaller', 'files', 'if', 'warranted', 'role',
+                 'variables', 'for', 'this', 'group', 'host', 'inventory', 'handlers', 'templates')
+
+
+def generate_structure_text(lines: int, max_depth: int = 6, indent_width: int = 4, comment_ratio: float = 0.3,
+                            seed: int = 0) -> str:
+    """
+    Generates a synthetic directory structure text in the format used by the Ansible documentation:
+    directories end with '/', nesting is expressed by indentation and some entries carry a '#' comment.
+    The depth follows a random walk, so the output mixes deep chains with wide, flat directories.
+
+    Args:
+        lines (int): The number of entries to generate.
+        max_depth (int): The maximum nesting depth.
+        indent_width (int): The number of spaces per nesting level.
+        comment_ratio (float): The fraction of entries with a comment.
+        seed (int): The random seed, so that the same arguments always produce the same text.
+
+    Returns:
+        str: The directory structure text.
+    """
+    rng = random.Random(seed)
+    output = []
+    depth = 0
+    parent_is_directory = False
+    for number in range(lines):
+        # Only descend below a directory; otherwise stay or climb back up
+        if parent_is_directory and depth < max_depth and rng.random() < 0.6:
+            depth += 1
+        elif depth and rng.random() < 0.3:
+            depth = rng.randint(0, depth)
+
+        parent_is_directory = rng.random() < 0.4
+        if parent_is_directory:
+            name = f"{rng.choice(DIRECTORY_NAMES)}{number}/"
+        else:
+            name = f"{number}_{rng.choice(FILE_NAMES)}"
+
+        line = f"{' ' * (depth * indent_width)}{name}"
+        if rng.random() < comment_ratio:
+            comment = ' '.join(rng.choices(COMMENT_WORDS, k=rng.randint(2, 8)))
+            line = f"{line.ljust(32)} # {comment}"
+        output.append(line)
+    return '\n'.join(output)
+
+
+def generate_layouts(count: int, lines: int, seed: int = 0) -> dict:
+    """
+    Generates several synthetic layouts with varying indentation widths.
+
+    Args:
+        count (int): The number of layouts.
+        lines (int): The number of entries per layout.
+        seed (int): The random seed.
+
+    Returns:
+        dict: A dictionary mapping each layout's element ID to its directory structure text.
+    """
+    return {
+        f"synthetic-layout-{index}": generate_structure_text(lines, indent_width=(2, 3, 4)[index % 3],
+                                                             seed=seed + index)
+        for index in range(count)
+    }
+
+
+def generate_docs_page(layouts: dict, filler_paragraphs: int = 200) -> str:
+    """
+    Generates a Sphinx-like documentation page holding each layout in a <pre> block of its own
+    section, surrounded by prose, navigation and unrelated code blocks.
+
+    Args:
+        layouts (dict): A dictionary mapping each section's element ID to its directory structure text.
+        filler_paragraphs (int): The number of filler paragraphs before and after the layouts.
+
+    Returns:
+        str: The HTML page.
+    """
+    filler = '<p>Lorem ipsum dolor sit amet, <a href="#">consectetur</a> &amp; adipiscing elit.</p>\n'
+    page = ['<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Sample Ansible setup</title></head>',
+            '<body><nav class="toctree"><ul>']
+    page.extend(f'<li><a href="#{element_id}">{element_id}</a></li>' for element_id in layouts)
+    page.append('</ul></nav>\n<div class="document"><section id="intro"><h1>Sample Ansible setup</h1>')
+    page.append(filler * filler_paragraphs)
+    page.append('</section>\n')
+    for element_id, text in layouts.items():
+        page.append(f'<section id="{element_id}"><h2>{element_id}<a class="headerlink" href="#{element_id}">¶</a>'
+                    f'</h2><p>This layout is one of many.</p><div class="highlight-console notranslate">'
+                    f'<div class="highlight"><pre><span></span>{html.escape(text)}\n</pre></div></div></section>\n')
+    page.append(f'<section id="more">{filler * filler_paragraphs}<pre>ansible-playbook site.yml</pre></section>')
+    page.append('</div></body></html>\n')
+    return ''.join(page)
+
+
+class QuietRequestHandler(SimpleHTTPRequestHandler):
+    """A static file handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(directory):
+    """
+    Serves a directory over HTTP on a free local port, as a stand-in for the documentation server.
+    The server supports conditional requests with If-Modified-Since.
+
+    Args:
+        directory (str or Path): The directory to serve.
+
+    Yields:
+        str: The base URL of the server, without a trailing slash.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietRequestHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
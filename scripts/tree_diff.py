@@ -0,0 +1,284 @@
+from reconcile import Operation, expected_file_content
+
+from collections import namedtuple
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import sys
+
+CHANGE_KINDS = ('added', 'removed', 'moved', 'renamed', 'comment')
+
+Change = namedtuple('Change', ['kind', 'type', 'path', 'new_path', 'old_comment', 'new_comment', 'node'])
+"""
+A structural change between two revisions of a layout. `path` is the '/'-separated path in the old
+revision (the new one for additions) and `new_path` the destination of moves and renames. `node` is
+the added node, for planning; it is not part of the report.
+"""
+
+
+def _node_body(node) -> bytes:
+    """Hashes a node's type, comment and children, but not its name."""
+    body = hashlib.blake2b(digest_size=16)
+    body.update(f"{node['type']}\0{node['comment']}\0".encode('utf-8'))
+    for child in node.get('children') or ():
+        body.update(child.digest)
+    return body.digest()
+
+
+def _node_digest(node, body: bytes) -> bytes:
+    """Combines a node's name with the hash of its body."""
+    return hashlib.blake2b(node['path'].encode('utf-8') + b'\0' + body, digest_size=16).digest()
+
+
+def compute_digests(structure) -> bytes:
+    """
+    Computes the Merkle hash of every node of a parsed structure, over its name, type, comment and
+    the hashes of its children, and stores it in the node's `digest` slot. Identical subtrees have
+    identical digests, so a diff can skip them without descending. Nodes are visited iteratively in
+    post-order, and nodes whose digest is already set are not hashed again.
+
+    Args:
+        structure (list): A list of StructureNode, as returned by `parse.parse_directory_structure`.
+
+    Returns:
+        bytes: The digest of the whole structure.
+    """
+    pending = [(node, False) for node in reversed(structure)]
+    while pending:
+        node, children_done = pending.pop()
+        if node.digest is not None:
+            continue
+        children = node.get('children') or ()
+        if children and not children_done:
+            pending.append((node, True))
+            pending.extend((child, False) for child in reversed(children) if child.digest is None)
+            continue
+        node.digest = _node_digest(node, _node_body(node))
+
+    root = hashlib.blake2b(digest_size=16)
+    for node in structure:
+        root.update(node.digest)
+    return root.digest()
+
+
+def diff_structures(old_structure, new_structure) -> list:
+    """
+    Compares two revisions of a parsed structure. Entries are matched by name level by level, and
+    matched subtrees with identical digests are skipped, so the work is proportional to the changed
+    subtrees. Unmatched entries are then paired by content: an identical subtree under a different
+    parent is reported as moved, one under the same parent with a different name as renamed. A
+    matched entry whose comment differs is reported as a comment edit, and an entry that changed
+    between file and directory as removed and added.
+
+    Args:
+        old_structure (list): The old revision, as returned by `parse.parse_directory_structure`.
+        new_structure (list): The new revision.
+
+    Returns:
+        list: The Change tuples, sorted by path.
+    """
+    compute_digests(old_structure)
+    compute_digests(new_structure)
+
+    changes = []
+    removed = []  # (parent path, node) of old entries without a match
+    added = []  # (parent path, node) of new entries without a match
+    pending = [('', old_structure, new_structure)]
+    while pending:
+        parent, old_items, new_items = pending.pop()
+        old_by_name = {item['path']: item for item in old_items}
+        new_by_name = {item['path']: item for item in new_items}
+
+        for name, new_item in new_by_name.items():
+            old_item = old_by_name.get(name)
+            if old_item is None:
+                added.append((parent, new_item))
+                continue
+            if old_item.digest == new_item.digest:
+                continue  # Identical subtree
+            if old_item['type'] != new_item['type']:
+                removed.append((parent, old_item))
+                added.append((parent, new_item))
+                continue
+
+            path = f"{parent}{name}"
+            if old_item['comment'] != new_item['comment']:
+                changes.append(Change('comment', new_item['type'], path, None,
+                                      old_item['comment'], new_item['comment'], None))
+            if new_item['type'] == 'directory':
+                pending.append((f"{path}/", old_item['children'] or [], new_item['children'] or []))
+
+        removed.extend((parent, old_item) for name, old_item in old_by_name.items() if name not in new_by_name)
+
+    # Pair removed and added entries with identical content, preferring the same name
+    removed_by_body = {}
+    for parent, node in removed:
+        removed_by_body.setdefault(_node_body(node), []).append((parent, node))
+
+    for parent, node in added:
+        candidates = removed_by_body.get(_node_body(node), [])
+        match = next((candidate for candidate in candidates if candidate[1]['path'] == node['path']), None)
+        if match is None and candidates:
+            same_parent = [candidate for candidate in candidates if candidate[0] == parent]
+            # A file's body is only its type and comment, too weak a signal without the same parent
+            if same_parent or node['type'] == 'directory' and node['children']:
+                match = (same_parent or candidates)[0]
+
+        new_path = f"{parent}{node['path']}"
+        if match is None:
+            changes.append(Change('added', node['type'], new_path, None, None, node['comment'], node))
+            continue
+
+        candidates.remove(match)
+        old_parent, old_node = match
+        kind = 'renamed' if old_parent == parent else 'moved'
+        changes.append(Change(kind, node['type'], f"{old_parent}{old_node['path']}", new_path,
+                              old_node['comment'], node['comment'], None))
+
+    for candidates in removed_by_body.values():
+        for parent, node in candidates:
+            changes.append(Change('removed', node['type'], f"{parent}{node['path']}", None,
+                                  node['comment'], None, None))
+
+    changes.sort(key=lambda change: (change.path, CHANGE_KINDS.index(change.kind)))
+    return changes
+
+
+def supports_subtree_sync(structure) -> bool:
+    """
+    Tells whether a structure can be synced by subtree, which requires every entry to be reachable by
+    a unique path: sibling names must be distinct and must not span several segments, like 'a/b'.
+
+    Args:
+        structure (list): The parsed structure.
+
+    Returns:
+        bool: True if changes to the structure can be applied with `plan_subtree_sync`.
+    """
+    pending = [structure]
+    while pending:
+        items = pending.pop()
+        names = set()
+        for item in items:
+            if item['path'] in names or '/' in item['path']:
+                return False
+            names.add(item['path'])
+            if item.get('children'):
+                pending.append(item['children'])
+    return True
+
+
+def plan_subtree_sync(base_path, changes, write_comments=True) -> list:
+    """
+    Plans the filesystem operations that apply a diff to a template directory that is in sync with
+    the old revision, touching only the changed subtrees. Moves go through temporary names in their
+    source directory, so that swaps and moves onto removed entries do not collide.
+
+    Args:
+        base_path (str or Path): The template directory of the layout.
+        changes (list): The Change tuples, as returned by `diff_structures`.
+        write_comments (bool, optional): Whether files carry their comment as a header. Defaults to True.
+
+    Returns:
+        list: A list of Operation tuples for `reconcile.apply_plan`, in the order they must be applied.
+    """
+    base_path = Path(base_path)
+    stash_moves, deletions, moves, creations, rewrites = [], [], [], [], []
+
+    for index, change in enumerate(changes):
+        if change.kind in ('moved', 'renamed'):
+            source = base_path / change.path
+            stash = source.with_name(f".{source.name}.move-{index}")
+            stash_moves.append(Operation('move', source, stash))
+            moves.append(Operation('move', stash, base_path / change.new_path))
+        elif change.kind == 'removed':
+            deletions.append(Operation('delete', base_path / change.path, None))
+        elif change.kind == 'comment':
+            content = expected_file_content({'comment': change.new_comment}, write_comments)
+            if change.type == 'file' and content is not None:
+                rewrites.append(Operation('rewrite', base_path / change.path, content))
+        elif change.kind == 'added':
+            pending = [(base_path / change.path, change.node)]
+            while pending:
+                path, node = pending.pop()
+                if node['type'] == 'directory':
+                    creations.append(Operation('mkdir', path, None))
+                    pending.extend((path / child['path'], child) for child in reversed(node['children'] or []))
+                else:
+                    content = expected_file_content(node, write_comments)
+                    creations.append(Operation('create', path, content if content is not None else b''))
+
+    return stash_moves + deletions + moves + creations + rewrites
+
+
+def change_to_dict(change) -> dict:
+    """
+    Converts a Change to a JSON-serializable dictionary for the change report, leaving out unset fields.
+
+    Args:
+        change (Change): The change.
+
+    Returns:
+        dict: The change's fields, without the node.
+    """
+    return {field: value for field, value in change._asdict().items() if field != 'node' and value is not None}
+
+
+def format_change_report(report: dict) -> str:
+    """
+    Formats a change report as Markdown, with one list of changes per layout, e.g. for a PR body.
+
+    Args:
+        report (dict): A mapping of layout name to its list of change dictionaries.
+
+    Returns:
+        str: The Markdown report, or a note that the structure did not change.
+    """
+    sections = []
+    for layout_name, changes in report.items():
+        if not changes:
+            continue
+        lines = [f"#### {layout_name}"]
+        for change in changes:
+            path = f"`{change['path']}{'/' if change['type'] == 'directory' else ''}`"
+            if change['kind'] in ('moved', 'renamed'):
+                lines.append(f"- {change['kind']}: {path} → `{change['new_path']}`")
+            elif change['kind'] == 'comment':
+                lines.append(f"- comment of {path}: \"{change.get('old_comment', '')}\" → "
+                             f"\"{change.get('new_comment', '')}\"")
+            else:
+                lines.append(f"- {change['kind']}: {path}")
+        sections.append('\n'.join(lines))
+    return '\n\n'.join(sections) if sections else "No structural changes."
+
+
+def main():
+    from cli import read_structure_file
+
+    parser = argparse.ArgumentParser(
+        description='Compares two revisions of a directory structure, or formats a change report.')
+    parser.add_argument('files',
+                        type=Path,
+                        nargs='+',
+                        help='The old and new directory structure text files, or a JSON change report '
+                             'written by update.py --change-report.')
+    parser.add_argument('--json',
+                        action='store_true',
+                        help='Print the changes as JSON instead of Markdown.')
+    args = parser.parse_args()
+
+    if len(args.files) == 1:
+        report = json.loads(args.files[0].read_text(encoding='utf-8'))
+    elif len(args.files) == 2:
+        changes = diff_structures(read_structure_file(args.files[0]), read_structure_file(args.files[1]))
+        report = {args.files[1].stem: [change_to_dict(change) for change in changes]}
+    else:
+        parser.error('Expected two structure files or one change report.')
+
+    sys.stdout.write(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_change_report(report))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
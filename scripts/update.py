@@ -1,140 +1,508 @@
 from config import (
     CONFIG_PATH,
+    MANIFEST_PATH,
     README_PATH,
     find_project_root,
+    get_cache_dir,
     load_config,
-    validate_and_get_docs_url,
-    validate_and_get_selectors,
+    validate_and_get_sources,
 )
-from parse import (
-    build_layout_sections_string,
-    normalize_layout_name,
-    parse_directory_structure,
+from extract import BACKENDS, DEFAULT_BACKEND
+from fileio import write_text_if_changed
+from http_cache import cache_key, invalidate_cache_entry
+from manifest import (
+    content_hash,
+    empty_manifest,
+    is_unchanged,
+    load_manifest,
+    save_manifest,
 )
-from retrieve import fetch_directory_structures
-
+from metrics import enable_metrics, increment, profiled, timed, write_metrics
+from parse import build_layout_section, normalize_layout_name
+from parse_cache import configure_parse_cache_from_config, parse_structure_cached
+from readme import patch_readme, scan_readme_sections
+from reconcile import apply_plan, apply_plan_staged, format_plan, layout_lock, plan_template_layout
+from tree_diff import change_to_dict, diff_structures, plan_subtree_sync, supports_subtree_sync
+
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from shutil import rmtree
 import argparse
+import json
 import logging
 import os
-import re
 
 
-def sync_template_layout(base_path, structure, write_comments=True):
+def sync_template_layout(base_path, structure, write_comments=True, dry_run=False, staged=False):
     """
     Synchronizes the directory structure at the specified base path according to the
     given structure, removing files and directories not present in the structure.
 
+    The existing tree is compared against the structure first, and only the differences are
+    applied: missing directories and files are created, files are rewritten only when their
+    content differs, and unexpected entries are deleted. A run without differences touches no files.
+
+    With `staged`, the changes are not applied in place: the new tree is built next to the old one
+    and swapped in atomically, so readers never see a half-updated directory. Concurrent syncs of the
+    same directory are serialized by a lock file either way.
+
     Args:
         base_path (str or Path): The base path where the directory structure starts.
         structure (list): The directory structure as a list of dictionaries.
         write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+        dry_run (bool, optional): Whether to only plan the operations without applying them. Defaults to False.
+        staged (bool, optional): Whether to apply the changes with `reconcile.apply_plan_staged`. Defaults to False.
+
+    Returns:
+        list: The planned operations, as returned by `plan_template_layout`.
+    """
+    if dry_run:
+        with timed('sync.plan'):
+            return plan_template_layout(base_path, structure, write_comments)
+
+    with layout_lock(base_path):
+        with timed('sync.plan'):
+            plan = plan_template_layout(base_path, structure, write_comments)
+
+        if staged:
+            with timed('sync.apply'):
+                counts = apply_plan_staged(base_path, structure, plan, write_comments)
+            increment('directories_created', counts['mkdir'])
+            increment('files_created', counts['create'])
+            increment('files_linked', counts['link'])
+            increment('layouts_swapped', counts['swap'])
+        else:
+            with timed('sync.apply'):
+                counts = apply_plan(plan)
+            increment('directories_created', counts['mkdir'])
+            increment('files_created', counts['create'])
+            increment('files_rewritten', counts['rewrite'])
+            increment('entries_deleted', counts['delete'])
+
+    return plan
+
+
+def sync_changed_subtrees(base_path, changes, write_comments=True, dry_run=False):
+    """
+    Applies a structural diff to a template directory that is in sync with the diff's old revision,
+    touching only the changed subtrees instead of walking the whole directory.
+
+    Args:
+        base_path (str or Path): The template directory of the layout.
+        changes (list): The Change tuples, as returned by `tree_diff.diff_structures`.
+        write_comments (bool, optional): Whether to write comments in files. Defaults to True.
+        dry_run (bool, optional): Whether to only plan the operations without applying them. Defaults to False.
+
+    Returns:
+        list: The planned operations, as returned by `tree_diff.plan_subtree_sync`.
+    """
+    if dry_run:
+        with timed('sync.plan'):
+            return plan_subtree_sync(base_path, changes, write_comments)
+
+    with layout_lock(base_path):
+        with timed('sync.plan'):
+            plan = plan_subtree_sync(base_path, changes, write_comments)
+
+        with timed('sync.apply'):
+            counts = apply_plan(plan)
+        increment('directories_created', counts['mkdir'])
+        increment('files_created', counts['create'])
+        increment('files_rewritten', counts['rewrite'])
+        increment('entries_deleted', counts['delete'])
+        increment('entries_moved', counts['move'] // 2)  # Every move goes through a temporary name
+
+    return plan
+
+
+def update_layout(layout_name, structure_text, base_path, manifest_entry=None, dry_run=False, parsed_structure=None,
+                  subtree_sync=False, staged=False):
     """
-    # Convert base_path to a Path object if it's a string
-    base_path = Path(base_path)
-
-    # Create the base directory if it doesn't exist
-    base_path.mkdir(parents=True, exist_ok=True)
-
-    # Track paths that should exist according to the structure
-    expected_paths = set()
-
-    def create_or_update(base_path_, structure_):
-        """
-        Recursively creates or updates the directory and file structure based on the given
-        structure definition. Directories are created if they don't exist, and files are
-        either created or updated if they already exist and need to have comments added.
-        """
-        for item in structure_:
-            current_path = base_path_ / item['path']
-            expected_paths.add(current_path)
-
-            if item['type'] == 'directory':
-                current_path.mkdir(parents=True, exist_ok=True)
-                if 'children' in item:
-                    create_or_update(current_path, item['children'])
-            elif item['type'] == 'file':
-                if not current_path.exists() or (write_comments and 'comment' in item):
-                    with current_path.open('w') as file:
-                        if write_comments and 'comment' in item:
-                            file.write(f"# {item['comment']}\n")
-
-    create_or_update(base_path, structure)
-
-    def remove_unexpected(base_path_):
-        """
-        Removes files and directories that are not part of the expected structure
-        defined by the synchronization process.
-        """
-        for child in base_path_.iterdir():
-            if child not in expected_paths:
-                if child.is_dir():
-                    rmtree(child)
-                else:
-                    child.unlink()
-
-    remove_unexpected(base_path)
-
-
-def update_directory_structures(structures, base_path):
+    Processes a single directory structure and creates the corresponding template. The layout is
+    skipped without being parsed if its structure text matches the manifest entry, and is not synced
+    if its parsed tree does. Log messages are returned rather than emitted, so that layouts processed
+    concurrently can be logged in order.
+
+    The manifest entry records the structure text last synced. When it is available, the layout is
+    diffed against it, and with `subtree_sync` only the changed subtrees are synced, trusting that the
+    template directory still matches the recorded revision. With `staged`, the layout is always synced
+    as a whole, and swapped into place atomically.
+
+    Args:
+        layout_name (str): The layout name.
+        structure_text (str): The directory structure text of the layout.
+        base_path (Path): The base path where the templates should be created.
+        manifest_entry (dict, optional): The layout's 'templates' entry of the layout manifest.
+        dry_run (bool, optional): Whether to only plan the changes. Defaults to False.
+        parsed_structure (list, optional): The already parsed structure, if available.
+        subtree_sync (bool, optional): Whether to sync only the subtrees that changed since the recorded
+                                       revision, when there is one. Defaults to False.
+        staged (bool, optional): Whether to build the layout next to the template directory and swap it
+                                 into place. See `sync_template_layout`. Defaults to False.
+
+    Returns:
+        dict: A dictionary with 'synced' (whether the layout was synced), 'entry' (the updated manifest
+              entry), 'changes' (the structural changes as dictionaries, or None without a recorded
+              revision) and 'messages' (the log messages) keys.
+    """
+    normalized_name = normalize_layout_name(layout_name)
+    layout_base_path = base_path / 'templates' / normalized_name
+    manifest_entry = manifest_entry or {}
+
+    structure_hash = content_hash(structure_text)
+    if manifest_entry.get('structure_hash') == structure_hash and layout_base_path.is_dir():
+        increment('layouts_skipped')
+        return {'synced': False, 'entry': {**manifest_entry, 'structure_text': structure_text}, 'changes': None,
+                'messages': [f"Structure unchanged for layout: {normalized_name}"]}
+
+    if parsed_structure is None:
+        parsed_structure = parse_structure_cached(structure_text, structure_hash)
+    tree_hash = content_hash(parsed_structure)
+    entry = {'structure_hash': structure_hash, 'tree_hash': tree_hash, 'structure_text': structure_text}
+    if manifest_entry.get('tree_hash') == tree_hash and layout_base_path.is_dir():
+        increment('layouts_skipped')
+        return {'synced': False, 'entry': entry, 'changes': None,
+                'messages': [f"Structure unchanged for layout: {normalized_name}"]}
+
+    changes = previous_structure = None
+    if manifest_entry.get('structure_text') is not None:
+        previous_structure = parse_structure_cached(manifest_entry['structure_text'])
+        with timed('diff'):
+            changes = diff_structures(previous_structure, parsed_structure)
+
+    if (subtree_sync and not staged and changes is not None and layout_base_path.is_dir()
+            and supports_subtree_sync(previous_structure) and supports_subtree_sync(parsed_structure)):
+        plan = sync_changed_subtrees(layout_base_path, changes, dry_run=dry_run)
+    else:
+        plan = sync_template_layout(layout_base_path, parsed_structure, dry_run=dry_run, staged=staged)
+
+    messages = []
+    if dry_run:
+        messages.append(f"Planned changes for '{layout_base_path}':\n{format_plan(plan, layout_base_path)}")
+    messages.append(f"Structure {'planned' if dry_run else 'created'} for layout: {normalized_name} ({len(plan)} changes)")
+    return {'synced': True, 'entry': entry, 'changes': None if changes is None else list(map(change_to_dict, changes)),
+            'messages': messages}
+
+
+def update_directory_structures(structures, base_path, manifest_entries=None, dry_run=False, jobs=1,
+                                parse_processes=False, subtree_sync=False, change_report=None, staged=False):
     """
     Processes each directory structure and creates corresponding templates.
 
+    When manifest entries are given, layouts whose structure text is unchanged since they were last
+    synced are skipped without being parsed, and layouts whose parsed tree is unchanged are not synced.
+    The entries are updated in place to reflect the processed layouts.
+
+    With more than one job, independent layouts are parsed and synced concurrently by a thread pool,
+    and those that changed are optionally parsed up front by a process pool. Logging stays in layout
+    order, and every layout is attempted even if others fail; the result is the same as that of a
+    serial run.
+
     Args:
         structures (dict): A dictionary with layout names as keys and directory structure text as values.
         base_path (Path): The base path where the templates should be created.
+        manifest_entries (dict, optional): The 'templates' entries of the layout manifest.
+        dry_run (bool, optional): Whether to only log the planned changes. Defaults to False.
+        jobs (int, optional): The number of layouts processed concurrently. Defaults to 1.
+        parse_processes (bool, optional): Whether to parse layouts in a process pool when `jobs` > 1.
+        subtree_sync (bool, optional): Whether to sync only the changed subtrees of layouts with a
+                                       recorded revision. See `update_layout`.
+        change_report (dict, optional): Filled in place with the structural changes of every synced
+                                        layout with a recorded revision, keyed by layout name.
+        staged (bool, optional): Whether to swap each synced layout into place atomically. See `update_layout`.
+
+    Returns:
+        list: The names of the layouts that were synced (or would be, in a dry run).
+
+    Raises:
+        ExceptionGroup: If any layout failed, with one exception per failed layout.
     """
-    for layout_name, structure_text in structures.items():
-        normalized_name = normalize_layout_name(layout_name)
-        parsed_structure = parse_directory_structure(structure_text)
-        layout_base_path = base_path / 'templates' / normalized_name
-        sync_template_layout(layout_base_path, parsed_structure)
-        logging.info(f"Structure created for layout: {normalized_name}")
+    entries = manifest_entries if manifest_entries is not None else {}
+    layout_names = list(structures)
+
+    parsed_structures = dict.fromkeys(layout_names)
+    if parse_processes and jobs > 1:
+        # Layouts that `update_layout` skips on their structure text alone are not worth parsing
+        changed_names = [
+            layout_name for layout_name in layout_names
+            if not (is_unchanged(entries, layout_name, 'structure_hash', content_hash(structures[layout_name]))
+                    and (base_path / 'templates' / normalize_layout_name(layout_name)).is_dir())
+        ]
+        if len(changed_names) > 1:
+            from concurrent.futures import ProcessPoolExecutor  # Costly to import, and rarely needed
+
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                changed_texts = [structures[layout_name] for layout_name in changed_names]
+                for layout_name, parsed_structure in zip(changed_names,
+                                                         executor.map(parse_structure_cached, changed_texts)):
+                    parsed_structures[layout_name] = parsed_structure
+
+    def process(layout_name):
+        return update_layout(layout_name, structures[layout_name], base_path, entries.get(layout_name),
+                             dry_run, parsed_structures[layout_name], subtree_sync, staged)
+
+    outcomes = {}
+    if jobs > 1 and len(layout_names) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {layout_name: executor.submit(process, layout_name) for layout_name in layout_names}
+            for layout_name, future in futures.items():
+                try:
+                    outcomes[layout_name] = future.result()
+                except Exception as e:
+                    outcomes[layout_name] = e
+    else:
+        for layout_name in layout_names:
+            try:
+                outcomes[layout_name] = process(layout_name)
+            except Exception as e:
+                outcomes[layout_name] = e
+
+    return collect_layout_outcomes(outcomes, manifest_entries, change_report)
+
+
+def collect_layout_outcomes(outcomes, manifest_entries=None, change_report=None):
+    """
+    Logs the outcomes of `update_layout` in layout order, and records them in the manifest entries
+    and change report. Entries of layouts without an outcome are dropped from the manifest.
 
+    Args:
+        outcomes (dict): The outcome of every layout, or the exception it raised, keyed by layout name.
+        manifest_entries (dict, optional): The 'templates' entries of the layout manifest, updated in place.
+        change_report (dict, optional): Filled in place with the structural changes of every synced
+                                        layout with a recorded revision, keyed by layout name.
+
+    Returns:
+        list: The names of the layouts that were synced (or would be, in a dry run).
 
-def update_readme_with_structure(structures, readme_path="README.md"):
+    Raises:
+        ExceptionGroup: If any layout failed, with one exception per failed layout.
+    """
+    processed = []
+    errors = []
+    for layout_name, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            outcome.add_note(f"While updating layout: {layout_name}")
+            logging.error(f"Failed to update layout {layout_name}: {outcome}")
+            errors.append(outcome)
+            continue
+
+        for message in outcome['messages']:
+            logging.info(message)
+        if outcome['synced']:
+            processed.append(layout_name)
+        if change_report is not None and outcome['changes'] is not None:
+            change_report[layout_name] = outcome['changes']
+        if manifest_entries is not None:
+            manifest_entries[layout_name] = outcome['entry']
+
+    if manifest_entries is not None:
+        for layout_name in set(manifest_entries) - set(outcomes):
+            del manifest_entries[layout_name]
+
+    if errors:
+        raise ExceptionGroup(f"Failed to update {len(errors)} of {len(outcomes)} layouts", errors)
+
+    return processed
+
+
+def update_readme_with_structure(structures, readme_path="README.md", manifest_entries=None, dry_run=False,
+                                 parsed_structures=None):
     """
     Updates the README file with structured directory layouts in code blocks.
 
+    Each layout's section is wrapped in its own LAYOUT_START/LAYOUT_END markers inside the template
+    block, so that only the sections whose rendered content changed are spliced in. A layout whose
+    structure text and README section both match the manifest is not parsed or rendered again. The
+    README is written atomically, and not at all if its content is unchanged.
+
+    When manifest entries are given and every layout's structure text is unchanged since the README
+    was last updated, the README is not even read. The entries are updated in place.
+
     Args:
         structures (dict): A dictionary with layout names as keys and directory structure text as values.
         readme_path (str): Path to the README file.
-    """
-    # Generate the combined layout sections string
-    full_content = build_layout_sections_string(structures)
+        manifest_entries (dict, optional): The 'readme' entries of the layout manifest.
+        dry_run (bool, optional): Whether to leave the README untouched. Defaults to False.
+        parsed_structures (dict, optional): The already parsed structures of some layouts, keyed by layout name.
 
-    # Read the current README content
+    Returns:
+        list: The names of the layouts whose README section changed.
+    """
+    structure_hashes = {layout_name: content_hash(text) for layout_name, text in structures.items()}
+    if manifest_entries is not None and set(manifest_entries) == set(structures) and all(
+            is_unchanged(manifest_entries, layout_name, 'structure_hash', structure_hash)
+            for layout_name, structure_hash in structure_hashes.items()):
+        increment('readme_sections_skipped', len(structures))
+        logging.info("README sections unchanged.")
+        return []
+
+    # Read the current README content and locate its layout sections
     with open(readme_path, 'r', encoding='utf-8') as file:
         readme_content = file.read()
+    scanned = scan_readme_sections(readme_content)
 
-    # Define markers for where to insert the generated content
-    start_marker = "<!-- TEMPLATE_START -->"
-    end_marker = "<!-- TEMPLATE_END -->"
+    # Render the sections of new or changed layouts, reusing the README's text for the others
+    sections = {}
+    entries = {}
+    for layout_name, structure_text in structures.items():
+        section = None
+        if layout_name in scanned.layouts and is_unchanged(manifest_entries, layout_name, 'structure_hash',
+                                                           structure_hashes[layout_name]):
+            section = readme_content[slice(*scanned.layouts[layout_name])]
+            section_hash = content_hash(section)
+            if not is_unchanged(manifest_entries, layout_name, 'section_hash', section_hash):
+                section = None  # Edited by hand since the last run
+
+        if section is None:
+            parsed_structure = (parsed_structures or {}).get(layout_name)
+            if parsed_structure is None:
+                parsed_structure = parse_structure_cached(structure_text, structure_hashes[layout_name])
+            section = build_layout_section(layout_name, parsed_structure)
+            section_hash = content_hash(section)
+
+        sections[layout_name] = section
+        entries[layout_name] = {'structure_hash': structure_hashes[layout_name], 'section_hash': section_hash}
+
+    with timed('readme.patch'):
+        updated_content, processed = patch_readme(readme_content, scanned, sections)
+    increment('readme_sections_patched', len(processed))
+
+    if dry_run:
+        logging.info(f"README would be {'updated' if updated_content != readme_content else 'left unchanged'}.")
+        return processed
+
+    with timed('readme.write'):
+        written = write_text_if_changed(readme_path, updated_content, readme_content)
+    if written:
+        logging.info("README updated with the latest directory structures.")
+    else:
+        logging.info("README already up to date.")
+
+    if manifest_entries is not None:
+        manifest_entries.clear()
+        manifest_entries.update(entries)
+
+    return processed
+
+
+def run_update(args, force_updates=False):
+    """
+    Fetches the documentation and applies the updates selected by the command-line arguments.
 
-    # Replace content between markers
-    updated_content = re.sub(f"{start_marker}.*?{end_marker}",
-                             f"{start_marker}\n{full_content}\n{end_marker}",
-                             readme_content,
-                             flags=re.DOTALL)
+    With `args.pipeline`, fetching, parsing and syncing overlap instead of running as strict phases:
+    see `pipeline.run_pipeline`. The README is then rendered from the trees parsed by the pipeline.
 
-    # Write the updated content back to the README
-    with open(readme_path, 'w', encoding='utf-8') as file:
-        file.write(updated_content)
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments of `main`.
+        force_updates (bool): Optionally forces updates without argparse flags.
+    """
+    # The network stack is only needed once there is something to fetch
+    from retrieve import fetch_all_directory_structures_if_modified, load_all_cached_structures, structures_by_layout
 
-    logging.info("README updated with the latest directory structures.")
+    # A report left by an earlier run must not be mistaken for the changes of this one
+    if args.change_report:
+        args.change_report.unlink(missing_ok=True)
 
+    # Configuration loading
+    config = load_config(CONFIG_PATH)
+    """Loads configuration settings from a specified path."""
 
-def main(force_updates=False):
+    # Base path determination
+    script_dir = Path(__file__).resolve().parent
+    project_root = find_project_root(script_dir)
+    base_path = Path(os.getenv('GITHUB_WORKSPACE', project_root))
+    """Determines the base path for updates, accommodating local and CI environments."""
+
+    # Layout manifest loading
+    manifest = empty_manifest() if args.no_cache else load_manifest(MANIFEST_PATH)
+    """Loads the hashes of the layouts processed by previous runs, so unchanged layouts can be skipped."""
+
+    update_readme = args.update_readme or force_updates
+    update_directories = args.update_directories or force_updates
+
+    # Directory structures fetching
+    sources = validate_and_get_sources(config)
+    # A dry run must not record validators, or the next real run would skip the pending changes
+    cache_dir = None if args.no_cache or args.dry_run else get_cache_dir(config)
+    pipelined = None
+    if not args.pipeline:
+        # Retrieves and parses directory structures from Ansible documentation
+        results = fetch_all_directory_structures_if_modified(sources, cache_dir, stream=args.stream,
+                                                             backend=args.backend)
+        if results is None:
+            # The validators are shared by every output, which may not all be up to date: the layout
+            # manifest decides what to skip
+            logging.info("Documentation unchanged since the last run.")
+            results = load_all_cached_structures(cache_dir, sources)
+
+    try:
+        if args.pipeline:
+            import asyncio
+            from pipeline import run_pipeline
+
+            pipelined = asyncio.run(run_pipeline(sources, cache_dir, base_path, manifest, update_readme,
+                                                 update_directories, args.dry_run, args.subtree_sync, args.jobs,
+                                                 args.stream, args.backend, staged=args.staged))
+            results = pipelined['results']
+            if not pipelined['modified']:
+                logging.info("Documentation unchanged since the last run.")
+            """Fetches, parses and syncs every layout as soon as its predecessor stage hands it over."""
+        structures = structures_by_layout(results)
+
+        # Snapshot recording
+        if args.record_snapshots and not args.dry_run:
+            from snapshots import get_snapshot_store, record_snapshots
+
+            store_dir = get_snapshot_store(config)
+            if store_dir is None:
+                logging.warning("Caching is disabled; the fetched layouts are not recorded as snapshots.")
+            else:
+                recorded = record_snapshots(store_dir, sources, results)
+                logging.info("Snapshots recorded: "
+                             f"{', '.join(f'{snapshot.source}/{snapshot.selector}' for snapshot in recorded) or 'none'}")
+        """Keeps the changed structures in the content-addressed snapshot store, so past revisions can be queried."""
+
+        # README.md update
+        if update_readme:
+            processed = update_readme_with_structure(structures, README_PATH, manifest['readme'], args.dry_run,
+                                                     pipelined and pipelined['parsed'])
+            logging.info(f"README sections processed: {', '.join(processed) or 'none'}")
+            """Updates the README.md file with the latest directory structures if flagged."""
+
+        # Template directories update
+        if update_directories:
+            change_report = {}
+            if pipelined:
+                processed = collect_layout_outcomes(pipelined['outcomes'], manifest['templates'], change_report)
+            else:
+                processed = update_directory_structures(structures, base_path, manifest['templates'], args.dry_run,
+                                                        args.jobs, args.parse_processes, args.subtree_sync,
+                                                        change_report, args.staged)
+            logging.info(f"Template layouts processed: {', '.join(processed) or 'none'}")
+            """Updates the template directories to match the latest Ansible documentation structures if flagged."""
+
+            if args.change_report:
+                args.change_report.parent.mkdir(parents=True, exist_ok=True)
+                write_text_if_changed(args.change_report,
+                                      json.dumps(change_report, indent=2, ensure_ascii=False) + '\n')
+                logging.info(f"Change report written to {args.change_report}")
+
+        if not args.dry_run:
+            save_manifest(manifest, MANIFEST_PATH)
+    except BaseException:
+        # Drop the cached validators so the next run does not skip the unfinished updates
+        if cache_dir:
+            for source in sources.values():
+                invalidate_cache_entry(cache_dir, cache_key(source['docs_url'], source['selectors']))
+        raise
+
+
+def add_update_arguments(parser):
     """
-    Main function to orchestrate updates based on Ansible documentation.
+    Adds the command-line arguments of the update command to a parser.
 
     Args:
-        force_updates (bool): Optionally forces updates without argparse flags.
+        parser (argparse.ArgumentParser): The parser to extend.
     """
-    parser = argparse.ArgumentParser(
-        description='Automatically updates Ansible template structures and README based on the latest documentation.')
-
     # Define command-line arguments for optional actions
     parser.add_argument('--update-readme',
                         action='store_true',
@@ -142,34 +510,85 @@ def main(force_updates=False):
     parser.add_argument('--update-directories',
                         action='store_true',
                         help='Optionally update directory structures to reflect current Ansible documentation.')
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help='Show the planned README and directory changes without applying them.')
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of layouts to parse and sync concurrently (default: 1).')
+    parser.add_argument('--parse-processes',
+                        action='store_true',
+                        help='With --jobs, parse layouts in separate processes instead of threads.')
+    parser.add_argument('--pipeline',
+                        action='store_true',
+                        help='Parse and sync each layout as soon as it is fetched, instead of fetching every source first.')
+    parser.add_argument('--subtree-sync',
+                        action='store_true',
+                        help='Sync only the subtrees that changed since the last run, instead of walking every template directory.')
+    parser.add_argument('--staged',
+                        action='store_true',
+                        help='Build each synced layout next to its template directory and swap it into place atomically.')
+    parser.add_argument('--change-report',
+                        type=Path,
+                        help='Write the structural changes of every synced layout to this JSON file.')
+    parser.add_argument('--record-snapshots',
+                        action='store_true',
+                        help='Record the fetched layouts that changed in the snapshot store of the configured CACHE_DIR.')
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='Stream the documentation and stop downloading once every selector is resolved.')
+    parser.add_argument('--backend',
+                        choices=['auto', *BACKENDS],
+                        default=DEFAULT_BACKEND,
+                        help='HTML extraction backend to use (default: %(default)s).')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Bypass the HTTP cache and layout manifest and always download and process every layout.')
+    parser.add_argument('--metrics-json',
+                        type=Path,
+                        help='Write the time spent per stage and the run counters to this JSON file.')
+    parser.add_argument('--profile',
+                        type=Path,
+                        help='Profile the run with cProfile and dump the statistics to this file.')
 
-    args = parser.parse_args()
 
-    # Configuration loading
-    config = load_config(CONFIG_PATH)
-    """Loads configuration settings from a specified path."""
+def execute_update(args, force_updates=False):
+    """
+    Runs the update selected by the command-line arguments, with metrics collection and profiling
+    if requested.
 
-    # Directory structures fetching
-    docs_url = validate_and_get_docs_url(config)
-    selectors = validate_and_get_selectors(config)
-    structures = fetch_directory_structures(docs_url, selectors)
-    """Retrieves and parses directory structures from Ansible documentation."""
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see `add_update_arguments`.
+        force_updates (bool): Optionally forces updates without argparse flags.
+    """
+    enable_metrics(args.metrics_json is not None)
+    if not args.no_cache:
+        configure_parse_cache_from_config()
+    try:
+        with profiled(args.profile), timed('total'):
+            run_update(args, force_updates)
+    finally:
+        if args.metrics_json:
+            write_metrics(args.metrics_json)
+            logging.info(f"Metrics written to {args.metrics_json}")
 
-    # Base path determination
-    script_dir = Path(__file__).resolve().parent
-    project_root = find_project_root(script_dir)
-    base_path = Path(os.getenv('GITHUB_WORKSPACE', project_root))
-    """Determines the base path for updates, accommodating local and CI environments."""
 
-    # README.md update
-    if args.update_readme or force_updates:
-        update_readme_with_structure(structures, README_PATH)
-        """Updates the README.md file with the latest directory structures if flagged."""
+def main(force_updates=False):
+    """
+    Main function to orchestrate updates based on Ansible documentation.
+
+    Args:
+        force_updates (bool): Optionally forces updates without argparse flags.
+    """
+    parser = argparse.ArgumentParser(
+        description='Automatically updates Ansible template structures and README based on the latest documentation.')
+    add_update_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
 
-    # Template directories update
-    if args.update_directories or force_updates:
-        update_directory_structures(structures, base_path)
-        """Updates the template directories to match the latest Ansible documentation structures if flagged."""
+    execute_update(args, force_updates)
 
 
 if __name__ == "__main__":
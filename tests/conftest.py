@@ -0,0 +1,5 @@
+from pathlib import Path
+import sys
+
+# The scripts are run as plain files rather than installed, so they import each other by module name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
@@ -0,0 +1,106 @@
+from check import check_layout, compile_layout
+from parse import parse_directory_structure
+
+import os
+
+import pytest
+
+LAYOUT = compile_layout(parse_directory_structure("""
+site.yml            # main playbook
+README.md           # (optional) notes
+roles/
+    common/         # this hierarchy represents a "role"
+        tasks/
+            main.yml
+        handlers/
+            main.yml
+    webtier/        # same kind of structure as "common" was above
+"""))
+
+
+def make_tree(root, paths):
+    """Creates the files of '/'-separated paths, and the directories of paths ending with '/'."""
+    for path in paths:
+        target = root / path
+        if path.endswith('/'):
+            target.mkdir(parents=True, exist_ok=True)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text('')
+
+
+def age_directories(root, seconds=3600):
+    """Moves the mtime of every directory into the past, out of the cache's racy window."""
+    past = os.stat(root).st_mtime - seconds
+    for dir_path, _, _ in os.walk(root):
+        os.utime(dir_path, (past, past))
+
+
+ROLE = ['tasks/main.yml', 'handlers/main.yml']
+
+
+@pytest.fixture
+def repository(tmp_path):
+    root = tmp_path / 'repository'
+    make_tree(root, ['site.yml', '.git/HEAD'] + [f"roles/{role}/{path}" for role in ('web', 'db') for path in ROLE])
+    return root
+
+
+def test_every_role_matching_the_pattern_conforms(repository):
+    report = check_layout(repository, LAYOUT)
+
+    assert (report['missing'], report['unexpected']) == ([], [])
+
+
+def test_roles_are_checked_against_the_pattern(repository):
+    (repository / 'roles/db/handlers/main.yml').unlink()
+    (repository / 'roles/db/handlers').rmdir()
+    make_tree(repository, ['roles/db/stray.txt', 'roles/db/files/', 'vars/', 'roles/common/tasks/main.yml'])
+    (repository / 'site.yml').unlink()
+
+    report = check_layout(repository, LAYOUT, jobs=2)
+
+    assert report['missing'] == ['roles/common/handlers/', 'roles/db/handlers/', 'site.yml']
+    assert report['unexpected'] == ['roles/db/files/', 'roles/db/stray.txt', 'vars/']
+
+
+def test_optional_patterns_relax_the_check(repository):
+    (repository / 'roles/db/handlers/main.yml').unlink()
+
+    assert check_layout(repository, LAYOUT)['missing'] == ['roles/db/handlers/main.yml']
+    assert check_layout(repository, LAYOUT, optional=('roles/*/handlers/*',))['missing'] == []
+
+
+def test_without_patterns_example_roles_are_required(repository):
+    layout = compile_layout(parse_directory_structure("roles/\n    common/\n        tasks/\n"), patterns=())
+
+    report = check_layout(repository, layout, ignore=('.git', 'site.yml'))
+
+    assert report['missing'] == ['roles/common/']
+    assert report['unexpected'] == ['roles/db/', 'roles/web/']
+
+
+def test_cached_listings_are_reread_after_an_mtime_change(repository, tmp_path):
+    cache_path = tmp_path / 'check-cache.json'
+    age_directories(repository)
+
+    first = check_layout(repository, LAYOUT, cache_path=cache_path)
+    second = check_layout(repository, LAYOUT, cache_path=cache_path)
+    assert (first['listed'], first['reused']) == (8, 0)
+    assert (second['listed'], second['reused']) == (0, 8)
+    assert second['unexpected'] == []
+
+    make_tree(repository, ['roles/web/tasks/extra.yml'])
+    third = check_layout(repository, LAYOUT, cache_path=cache_path)
+
+    assert (third['listed'], third['reused']) == (1, 7)
+    assert third['unexpected'] == ['roles/web/tasks/extra.yml']
+
+
+def test_recently_modified_directories_are_not_cached(repository, tmp_path):
+    cache_path = tmp_path / 'check-cache.json'
+
+    check_layout(repository, LAYOUT, cache_path=cache_path)
+    second = check_layout(repository, LAYOUT, cache_path=cache_path)
+
+    assert second['reused'] == 0
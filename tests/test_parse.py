@@ -0,0 +1,72 @@
+from parse import analyze_structure, iter_structure_lines, parse_directory_structure
+
+
+def outline(structure, depth=0):
+    """Flattens a parsed structure into (depth, path) pairs, in document order."""
+    pairs = []
+    for item in structure:
+        pairs.append((depth, item['path']))
+        if item['type'] == 'directory':
+            pairs.extend(outline(item['children'], depth + 1))
+    return pairs
+
+
+def test_parses_nested_entries_with_comments():
+    structure = parse_directory_structure("""
+site.yml            # main playbook
+roles/
+    common/         # a role
+        main.yml
+""")
+
+    assert structure == [
+        {'type': 'file', 'path': 'site.yml', 'comment': 'main playbook', 'children': None},
+        {'type': 'directory', 'path': 'roles', 'comment': '', 'children': [
+            {'type': 'directory', 'path': 'common', 'comment': 'a role', 'children': [
+                {'type': 'file', 'path': 'main.yml', 'comment': '', 'children': None},
+            ]},
+        ]},
+    ]
+
+
+def test_tied_indentation_steps_resolve_like_the_original_parser():
+    # Steps of 4 and 2 are equally common, and 4 is seen first: the step of 2 still wins
+    text = "a/\n    b/\n        c\nd/\n  e/\n    f\n"
+
+    assert analyze_structure(text)[0] == 2
+    assert outline(parse_directory_structure(text)) == [
+        (0, 'a'), (1, 'b'), (2, 'c'), (0, 'd'), (1, 'e'), (2, 'f')]
+
+
+def test_most_common_indentation_step_wins():
+    # The odd step of 2 rounds to the nearest level of 4
+    text = "a/\n    b/\n        c\nd/\n  e\n"
+
+    assert analyze_structure(text)[0] == 4
+    assert outline(parse_directory_structure(text)) == [(0, 'a'), (1, 'b'), (2, 'c'), (0, 'd'), (0, 'e')]
+
+
+def test_tab_indentation_counts_each_tab_once():
+    text = "a/\n\tb/\n\t\tc\n\td\ne\n"
+
+    assert analyze_structure(text)[0] == 1
+    assert outline(parse_directory_structure(text)) == [(0, 'a'), (1, 'b'), (2, 'c'), (1, 'd'), (0, 'e')]
+
+
+def test_mixed_tab_and_space_indentation_counts_characters():
+    text = "a/\n  b/\n  \t\tc\n\t\td\n"
+
+    assert list(iter_structure_lines(text)) == [(0, 'a/'), (2, 'b/'), (4, 'c'), (2, 'd')]
+    assert outline(parse_directory_structure(text)) == [(0, 'a'), (1, 'b'), (2, 'c'), (1, 'd')]
+
+
+def test_only_leading_whitespace_counts_towards_indentation():
+    text = "roles/\n    common/\nsite.yml        \n"
+
+    assert outline(parse_directory_structure(text)) == [(0, 'roles'), (1, 'common'), (0, 'site.yml')]
+
+
+def test_line_iterables_parse_like_strings():
+    text = "roles/\n    common/\n        main.yml  # tasks\nsite.yml\n"
+
+    assert parse_directory_structure(iter(text.splitlines(keepends=True))) == parse_directory_structure(text)
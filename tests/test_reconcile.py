@@ -0,0 +1,139 @@
+from parse import parse_directory_structure
+from reconcile import Operation, apply_plan, plan_template_layout
+
+import pytest
+
+STRUCTURE = parse_directory_structure("""
+site.yml            # main playbook
+roles/
+    common/
+        tasks/
+            main.yml    # tasks file
+""")
+
+
+def snapshot(root):
+    """Lists a tree as relative paths, with a trailing '/' for directories, and file contents."""
+    return {
+        f"{path.relative_to(root).as_posix()}{'/' if path.is_dir() else ''}": None if path.is_dir() else path.read_bytes()
+        for path in root.rglob('*')
+    }
+
+
+def sync(root, structure=STRUCTURE, **kwargs):
+    plan = plan_template_layout(root, structure, **kwargs)
+    apply_plan(plan)
+    return plan
+
+
+@pytest.fixture
+def layout(tmp_path):
+    root = tmp_path / 'layout'
+    sync(root)
+    return root
+
+
+def test_creates_missing_tree(tmp_path):
+    root = tmp_path / 'layout'
+    sync(root)
+    assert snapshot(root) == {
+        'site.yml': b'# main playbook\n',
+        'roles/': None,
+        'roles/common/': None,
+        'roles/common/tasks/': None,
+        'roles/common/tasks/main.yml': b'# tasks file\n',
+    }
+
+
+def test_resync_is_a_no_op(layout):
+    assert plan_template_layout(layout, STRUCTURE) == []
+
+
+def test_deletes_deep_orphans(layout):
+    (layout / 'roles/common/tasks/extra.yml').write_text('x')
+    (layout / 'roles/common/tasks/nested/deeper').mkdir(parents=True)
+    (layout / 'roles/common/tasks/nested/deeper/file').write_text('x')
+    (layout / 'roles/other').mkdir()
+    expected = snapshot(layout)
+    del expected['roles/common/tasks/extra.yml']
+
+    plan = sync(layout)
+
+    assert sorted(op.path.relative_to(layout).as_posix() for op in plan if op.action == 'delete') == [
+        'roles/common/tasks/extra.yml', 'roles/common/tasks/nested', 'roles/other']
+    assert snapshot(layout) == {path: content for path, content in expected.items()
+                                if not path.startswith(('roles/common/tasks/nested', 'roles/other'))}
+
+
+def test_replaces_file_where_directory_is_expected(layout):
+    (layout / 'roles/common/tasks/main.yml').unlink()
+    (layout / 'roles/common/tasks').rmdir()
+    (layout / 'roles/common/tasks').write_text('not a directory')
+
+    plan = sync(layout)
+
+    assert Operation('delete', layout / 'roles/common/tasks', None) in plan
+    assert (layout / 'roles/common/tasks').is_dir()
+    assert (layout / 'roles/common/tasks/main.yml').read_bytes() == b'# tasks file\n'
+
+
+def test_replaces_directory_where_file_is_expected(layout):
+    (layout / 'site.yml').unlink()
+    (layout / 'site.yml').mkdir()
+    (layout / 'site.yml/inner.yml').write_text('x')
+
+    plan = sync(layout)
+
+    assert plan[0] == Operation('delete', layout / 'site.yml', None)
+    assert (layout / 'site.yml').read_bytes() == b'# main playbook\n'
+
+
+def test_replaces_file_at_the_base_path(tmp_path):
+    root = tmp_path / 'layout'
+    root.write_text('not a directory')
+
+    sync(root)
+
+    assert (root / 'site.yml').read_bytes() == b'# main playbook\n'
+
+
+def test_keep_patterns_protect_unexpected_entries(layout):
+    (layout / '.git').mkdir()
+    (layout / '.git/HEAD').write_text('ref')
+    (layout / 'roles/common/README.md').write_text('notes')
+    (layout / 'roles/common/junk').write_text('x')
+
+    plan = sync(layout, keep=('.git', 'roles/*/README.md'))
+
+    assert [op.path for op in plan] == [layout / 'roles/common/junk']
+    assert (layout / '.git/HEAD').read_text() == 'ref'
+    assert (layout / 'roles/common/README.md').read_text() == 'notes'
+
+
+def test_rewrites_only_changed_files(layout):
+    (layout / 'site.yml').write_text('# edited\n')
+
+    assert plan_template_layout(layout, STRUCTURE) == [
+        Operation('rewrite', layout / 'site.yml', b'# main playbook\n')]
+
+
+def test_without_comments_existing_files_are_left_alone(layout):
+    (layout / 'site.yml').write_text('user content')
+
+    assert plan_template_layout(layout, STRUCTURE, write_comments=False) == []
+
+
+def test_dry_run_plan_is_ordered_and_touches_nothing(layout):
+    (layout / 'roles/common/tasks/main.yml').write_text('# stale\n')
+    (layout / 'orphan').mkdir()
+    (layout / 'site.yml').unlink()
+    before = snapshot(layout)
+
+    plan = plan_template_layout(layout, STRUCTURE)
+
+    assert plan == [
+        Operation('delete', layout / 'orphan', None),
+        Operation('create', layout / 'site.yml', b'# main playbook\n'),
+        Operation('rewrite', layout / 'roles/common/tasks/main.yml', b'# tasks file\n'),
+    ]
+    assert snapshot(layout) == before
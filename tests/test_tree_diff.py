@@ -0,0 +1,107 @@
+from parse import parse_directory_structure
+from reconcile import apply_plan, plan_template_layout
+from tree_diff import Change, change_to_dict, diff_structures, format_change_report, plan_subtree_sync
+
+OLD = """
+site.yml            # playbook
+roles/
+    common/
+        handlers/
+            main.yml    # handlers file
+        tasks/
+            main.yml    # tasks file
+library/
+"""
+
+
+def diff(old_text, new_text):
+    return diff_structures(parse_directory_structure(old_text), parse_directory_structure(new_text))
+
+
+def test_identical_structures_have_no_changes():
+    assert diff(OLD, OLD) == []
+
+
+def test_reports_moved_subtree():
+    new = """
+site.yml            # playbook
+roles/
+    common/
+        tasks/
+            main.yml    # tasks file
+library/
+    handlers/
+        main.yml    # handlers file
+"""
+
+    assert diff(OLD, new) == [Change('moved', 'directory', 'roles/common/handlers', 'library/handlers', '', '', None)]
+
+
+def test_reports_renamed_entry():
+    new = OLD.replace('site.yml', 'main.yml')
+
+    assert diff(OLD, new) == [Change('renamed', 'file', 'site.yml', 'main.yml', 'playbook', 'playbook', None)]
+
+
+def test_reports_comment_edit():
+    new = OLD.replace('# playbook', '# main playbook')
+
+    assert diff(OLD, new) == [Change('comment', 'file', 'site.yml', None, 'playbook', 'main playbook', None)]
+
+
+def test_reports_type_change_as_removed_and_added():
+    new = OLD.replace('library/', 'library')
+
+    changes = diff(OLD, new)
+
+    assert [(change.kind, change.type, change.path) for change in changes] == [
+        ('added', 'file', 'library'), ('removed', 'directory', 'library')]
+
+
+def test_change_report_lists_changes_in_path_order():
+    new = """
+main.yml            # main playbook
+roles/
+    common/
+        tasks/
+            main.yml    # tasks file
+library/
+    handlers/
+        main.yml    # handlers file
+"""
+    report = {'layout': [change_to_dict(change) for change in diff(OLD, new)]}
+
+    assert format_change_report(report) == '\n'.join([
+        "#### layout",
+        "- added: `main.yml`",
+        "- moved: `roles/common/handlers/` → `library/handlers`",
+        "- removed: `site.yml`",
+    ])
+
+
+def test_subtree_sync_brings_the_tree_to_the_new_revision(tmp_path):
+    new = """
+main.yml            # playbook
+roles/
+    common/
+        tasks/
+            main.yml    # the tasks file
+        defaults/
+            main.yml
+library/
+    handlers/
+        main.yml    # handlers file
+"""
+    root = tmp_path / 'layout'
+    apply_plan(plan_template_layout(root, parse_directory_structure(OLD)))
+    handlers_inode = (root / 'roles/common/handlers/main.yml').stat().st_ino
+
+    changes = diff(OLD, new)
+    assert sorted(change.kind for change in changes) == ['added', 'comment', 'moved', 'renamed']
+
+    apply_plan(plan_subtree_sync(root, changes))
+
+    assert plan_template_layout(root, parse_directory_structure(new)) == []
+    # Moved entries are renamed on disk, not recreated
+    assert (root / 'library/handlers/main.yml').stat().st_ino == handlers_inode
+    assert (root / 'roles/common/tasks/main.yml').read_bytes() == b'# the tasks file\n'